@@ -1,13 +1,40 @@
-from flask import Flask, render_template, request
-import pandas as pd
+from flask import Flask, render_template, request, abort, jsonify, make_response, Response, send_file, \
+    stream_with_context
 import os
 import re
+import json
+import gzip
+import base64
+import bisect
+import csv
+import io
+import tempfile
+import time
+import hashlib
+import hmac
+import subprocess
+import sys
+import threading
+import unicodedata
+from collections import OrderedDict
+from html import escape
 from urllib.parse import urlparse
+from justificado import JUSTIFY_WIDTH, justificar_bloques
+import buscador
+import comparar
+import tabla_grados
+
+try:
+    import brotli  # opcional: si no está instalado se comprime solo con gzip
+except ImportError:
+    brotli = None
 
 # Explicitar carpetas de plantillas/estáticos
 app = Flask(__name__, template_folder="templates", static_folder="static")
 
 BASE_PATH = os.path.join("BibliografiasUGR", "grados", "Comparativas")
+# Índice por grado que escribe comparar.py (contadores ya calculados, sin tener que parsear el texto)
+INDICE_GRADO = "indice_grado.json"
 
 bibliotecas = [
     "B. Filosofía y Letras A", "B. Informática y Telecom.",
@@ -27,23 +54,8 @@ bibliotecas_master = [
     "B. Económicas y Empres.", "B. Educación", "B. Farmacia"
 ]
 
-# ---- Carga segura del Excel (no romper en Render si falta el archivo o el engine) ----
-_DF_PATH = "Grados_UGR_Centros.xlsx"
-def _cargar_df():
-    if not os.path.exists(_DF_PATH):
-        return pd.DataFrame()
-    try:
-        # requiere openpyxl en requirements.txt
-        df_ = pd.read_excel(_DF_PATH, engine="openpyxl")
-    except Exception:
-        try:
-            df_ = pd.read_excel(_DF_PATH)
-        except Exception:
-            return pd.DataFrame()
-    df_.columns = df_.columns.str.strip()
-    return df_
-
-df = _cargar_df()
+# ---- Tabla biblioteca → grados compilada desde el Excel (pandas solo se importa si el Excel ha cambiado) ----
+_tabla_grados = tabla_grados.cargar()
 
 # ---------- Utilidades para limpiar cabecera y hacer enlaces clicables ----------
 
@@ -82,10 +94,15 @@ def _linkify(texto: str) -> str:
         return f'<a href="{url}" target="_blank" rel="noopener noreferrer">{url}</a>{trail}'
     return URL_RE.sub(repl, texto)
 
-def _preparar_contenido(contenido_txt: str) -> str:
+def _preparar_cuerpo(cuerpo: str, justificar: bool = False, ancho: int = JUSTIFY_WIDTH) -> str:
+    if justificar:
+        cuerpo = justificar_bloques(cuerpo, ancho)
+    return _linkify(cuerpo)
+
+def _preparar_contenido(contenido_txt: str, justificar: bool = False, ancho: int = JUSTIFY_WIDTH) -> str:
     x = _strip_cabecera_antigua(contenido_txt or "")
     x = _strip_cabeceras_genericas(x)
-    return _linkify(x)
+    return _preparar_cuerpo(x, justificar, ancho)
 
 # ---------- Leer totales en encabezados y sumar ----------
 
@@ -130,20 +147,16 @@ def _contar_cambios_por_parentesis(texto: str) -> tuple[int, int, int]:
     anadidos   = _extraer_total_por_encabezado(texto, pat_anadidos)
     return (eliminados, anadidos, eliminados + anadidos)
 
-def extraer_cambios_y_ordenar(archivos, ruta):
-    resultado = []
-    for archivo in archivos:
-        if not archivo.endswith(".txt"):
-            continue
-        ruta_completa = os.path.join(ruta, archivo)
-        try:
-            with open(ruta_completa, "r", encoding="utf-8", errors="ignore") as f:
-                contenido = f.read()
-        except Exception:
-            contenido = ""
-        eliminados, anadidos, total = _contar_cambios_por_parentesis(contenido)
-        resultado.append((archivo, total, contenido))
-    return sorted(resultado, key=lambda x: (-x[1], x[0].lower()))
+PORCENTAJE_RE = re.compile(r"Porcentaje estimado de cambio:\s*(\d+)\s*%")
+
+def _cargar_indice_grado(ruta: str) -> dict[str, dict]:
+    """ {archivo .txt: línea del índice} o {} si el grado aún no tiene índice (comparativas antiguas). """
+    try:
+        with open(os.path.join(ruta, INDICE_GRADO), "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        return {linea["archivo"]: linea for linea in datos.get("asignaturas", []) if "archivo" in linea}
+    except Exception:
+        return {}
 
 # ---------- Naming helpers y resolución de carpetas ----------
 
@@ -223,11 +236,224 @@ STOP_SEGMENTS = {
     "grado","grados","doble-grado","grado-en","doble-grado-en"
 }
 
-def _dirs_en_comparativas():
+# ---------- Índice en memoria de Comparativas ----------
+
+""" Al arrancar se indexa toda la carpeta de Comparativas: carpetas de grado con su nombre amigable y, por asignatura,
+título, código, nº de cambios y el offset (en bytes) donde empieza el cuerpo tras las cabeceras. Las peticiones no
+vuelven a listar BASE_PATH ni a leer los .txt: solo se comprueba el mtime de BASE_PATH (grados nuevos o borrados) y se
+hace un scandir de los grados que se van a mostrar, releyendo únicamente los archivos cuyo mtime/tamaño ha cambiado.
+Cada cambio sube _indice["version"].
+Mientras un trabajo en segundo plano está reescribiendo las Comparativas (_indice_congelado), las peticiones no miran el
+disco y se sirven del índice tal como estaba; al terminar, sustituir_indice() construye uno nuevo aparte y lo cambia
+por el actual de una vez. """
+_indice_lock = threading.Lock()
+_indice = {"version": 0, "mtime_ns": None, "carpetas": [], "nombres": {}, "grados": {}}
+_indice_congelado = threading.Event()
+
+def _offset_cuerpo(datos: bytes, contenido: str) -> int:
+    cuerpo = _strip_cabeceras_genericas(_strip_cabecera_antigua(contenido))
+    if not cuerpo:
+        return len(datos)
+    pos = datos.find(cuerpo.split("\n", 1)[0].encode("utf-8"))
+    return pos if pos >= 0 else 0
+
+def _indexar_asignatura(ruta: str, archivo: str, st: os.stat_result, linea: dict | None) -> dict:
+    try:
+        with open(os.path.join(ruta, archivo), "rb") as f:
+            datos = f.read()
+    except OSError:
+        datos = b""
+    contenido = datos.decode("utf-8", errors="ignore")
+    # La línea del índice solo vale si se escribió a partir de este mismo .txt (una ejecución cortada puede dejarla vieja)
+    if linea is not None and comparar.registro_al_dia(linea, st):
+        eliminados, anadidos = linea.get("n_eliminados", 0), linea.get("n_anadidos", 0)
+        comunes = linea.get("n_comunes", 0)
+        porcentaje = round(linea.get("porcentaje", 0.0) * 100, 2)
+    else:
+        eliminados, anadidos, _ = _contar_cambios_por_parentesis(contenido)
+        comunes = _extraer_total_por_encabezado(contenido, r"Recursos\s+sin\s+cambios")
+        m = PORCENTAJE_RE.search(contenido)
+        porcentaje = float(m.group(1)) if m else 0.0
+    titulo, codigo = parsear_titulo_y_codigo(archivo)
+    return {
+        "archivo": archivo, "titulo": titulo, "codigo": codigo,
+        "n_eliminados": eliminados, "n_comunes": comunes, "n_anadidos": anadidos, "cambios": eliminados + anadidos,
+        "porcentaje": porcentaje,
+        "mtime_ns": st.st_mtime_ns, "size": st.st_size, "offset": _offset_cuerpo(datos, contenido),
+    }
+
+def _indexar_grado(carpeta: str, previo: dict | None) -> dict | None:
+    """ Devuelve el grado reindexado o None si no hay cambios respecto a `previo` (ni en los .txt ni en su índice). """
+    ruta = os.path.join(BASE_PATH, carpeta)
+    try:
+        indice_mtime = os.stat(os.path.join(ruta, INDICE_GRADO)).st_mtime_ns
+    except OSError:
+        indice_mtime = None
+    # Si comparar.py ha reescrito indice_grado.json los contadores pueden haber cambiado: se reindexa todo el grado
+    anteriores = previo["asignaturas"] if previo and previo["indice_mtime_ns"] == indice_mtime else {}
+    lineas = None
+    asignaturas, cambios = {}, previo is None or not anteriores
     try:
-        return [d for d in os.listdir(BASE_PATH) if os.path.isdir(os.path.join(BASE_PATH, d))]
-    except FileNotFoundError:
+        with os.scandir(ruta) as it:
+            entradas = [(fe.name, fe.stat()) for fe in it if fe.name.endswith(".txt")]
+    except OSError:
+        entradas = []
+    for archivo, st in entradas:
+        ant = anteriores.get(archivo)
+        if ant and ant["mtime_ns"] == st.st_mtime_ns and ant["size"] == st.st_size:
+            asignaturas[archivo] = ant
+            continue
+        if lineas is None:
+            lineas = _cargar_indice_grado(ruta)
+        asignaturas[archivo] = _indexar_asignatura(ruta, archivo, st, lineas.get(archivo))
+        cambios = True
+    if not cambios and set(asignaturas) == set(anteriores):
+        return None
+    orden = sorted(asignaturas.values(), key=lambda a: (-a["cambios"], a["archivo"].lower()))
+    # Firma del estado en disco del grado: ruta + mtimes (y tamaños) de sus archivos y de su índice
+    firma = (ruta, indice_mtime, tuple(sorted((a["archivo"], a["mtime_ns"], a["size"]) for a in orden)))
+    return {
+        "carpeta": carpeta, "nombre": nombre_amigable_carpeta(carpeta), "indice_mtime_ns": indice_mtime,
+        "asignaturas": asignaturas, "orden": [a["archivo"] for a in orden], "firma": firma,
+        "huella": hashlib.sha1(repr(firma).encode("utf-8")).hexdigest()[:16],
+    }
+
+def _listar_carpetas(mtime: int | None) -> list[str]:
+    if mtime is None:
         return []
+    with os.scandir(BASE_PATH) as it:
+        return sorted(e.name for e in it if e.is_dir())
+
+def _refrescar_carpetas() -> list[str]:
+    """ Lista de grados; solo se vuelve a listar BASE_PATH si su mtime ha cambiado. """
+    try:
+        mtime = os.stat(BASE_PATH).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime == _indice["mtime_ns"] or _indice_congelado.is_set():
+        return _indice["carpetas"]
+    with _indice_lock:
+        if mtime != _indice["mtime_ns"]:
+            carpetas = _listar_carpetas(mtime)
+            _indice["nombres"] = {c: nombre_amigable_carpeta(c) for c in carpetas}
+            _indice["grados"] = {c: g for c, g in _indice["grados"].items() if c in _indice["nombres"]}
+            _indice["carpetas"] = carpetas
+            _indice["mtime_ns"] = mtime
+            _indice["version"] += 1
+    return _indice["carpetas"]
+
+def grado_indexado(carpeta: str) -> dict | None:
+    """ Entrada del índice de un grado, al día con el disco (solo se revisan los archivos de ese grado). """
+    if carpeta not in _refrescar_carpetas():
+        return None
+    previo = _indice["grados"].get(carpeta)
+    if _indice_congelado.is_set() and previo is not None:
+        return previo
+    nuevo = _indexar_grado(carpeta, previo)
+    if nuevo is None:
+        return previo
+    with _indice_lock:
+        _indice["grados"][carpeta] = nuevo
+        _indice["version"] += 1
+    return nuevo
+
+def construir_indice():
+    for carpeta in _refrescar_carpetas():
+        grado_indexado(carpeta)
+
+def sustituir_indice():
+    """ Reindexa todas las Comparativas en un índice nuevo (reutilizando las entradas sin cambios del actual) y lo pone
+    en lugar del actual en una sola asignación, sin bloquear a las peticiones mientras se construye. """
+    global _indice
+    previo = _indice
+    try:
+        mtime = os.stat(BASE_PATH).st_mtime_ns
+    except OSError:
+        mtime = None
+    carpetas = _listar_carpetas(mtime)
+    grados = {}
+    for carpeta in carpetas:
+        anterior = previo["grados"].get(carpeta)
+        grados[carpeta] = _indexar_grado(carpeta, anterior) or anterior
+    nuevo = {"version": 0, "mtime_ns": mtime, "carpetas": carpetas,
+             "nombres": {c: nombre_amigable_carpeta(c) for c in carpetas}, "grados": grados}
+    with _indice_lock:
+        nuevo["version"] = _indice["version"] + 1
+        _indice = nuevo
+
+def leer_cuerpo(carpeta: str, asignatura: dict) -> str:
+    """ Cuerpo de la comparativa sin cabeceras, leído desde el offset indexado. Si el archivo ya no es el indexado (p. ej.
+    un trabajo lo ha regenerado con el índice congelado), el offset no vale y las cabeceras se quitan del texto leído. """
+    try:
+        with open(os.path.join(BASE_PATH, carpeta, asignatura["archivo"]), "rb") as f:
+            st = os.fstat(f.fileno())
+            if st.st_mtime_ns == asignatura["mtime_ns"] and st.st_size == asignatura["size"]:
+                f.seek(asignatura["offset"])
+                texto = f.read().decode("utf-8", errors="ignore")
+            else:
+                contenido = f.read().decode("utf-8", errors="ignore")
+                texto = _strip_cabeceras_genericas(_strip_cabecera_antigua(contenido))
+    except OSError:
+        return ""
+    return "\n".join(texto.splitlines())
+
+# ---------- Caché de fragmentos HTML por grado ----------
+
+""" El HTML de la sección de un grado (sus filas resumen) solo cambia si cambian sus archivos, así que se guarda en
+una LRU con la firma del grado (ruta + mtimes) como clave: una vista repetida de un grado popular es una búsqueda en un
+diccionario. Se expulsan los fragmentos menos usados cuando el total supera FRAGMENTOS_MAX_BYTES; las firmas antiguas
+de un grado que ha cambiado dejan de pedirse y acaban saliendo por el mismo camino. """
+FRAGMENTOS_MAX_BYTES = 48 * 1024 * 1024
+_fragmentos_lock = threading.Lock()
+_fragmentos: "OrderedDict[tuple, str]" = OrderedDict()
+_fragmentos_stats = {"aciertos": 0, "fallos": 0, "expulsiones": 0, "bytes": 0}
+
+def _render_grado(carpeta: str, grado: dict) -> str:
+    secciones = [f"<h2>{grado['nombre']}</h2>"]
+    for archivo in grado["orden"]:
+        asignatura = grado["asignaturas"][archivo]
+        titulo, codigo, cambios = asignatura["titulo"], asignatura["codigo"], asignatura["cambios"]
+        izquierda = f"{titulo} ({codigo})" if codigo else titulo
+        secciones.append(
+            f"""
+<details class="cmp" data-carpeta="{escape(carpeta)}" data-archivo="{escape(archivo)}">
+  <summary class="toc">
+    <span class="cmp-left">{izquierda}</span>
+    <span class="toc-leader" aria-hidden="true"></span>
+    <span class="cmp-changes">nº cambios {cambios}</span>
+  </summary>
+  <pre></pre>
+</details>
+""".strip()
+        )
+    return "\n".join(secciones)
+
+def fragmento_grado(carpeta: str, grado: dict) -> str:
+    clave = grado["firma"]
+    with _fragmentos_lock:
+        html = _fragmentos.get(clave)
+        if html is not None:
+            _fragmentos.move_to_end(clave)
+            _fragmentos_stats["aciertos"] += 1
+            return html
+        _fragmentos_stats["fallos"] += 1
+    html = _render_grado(carpeta, grado)
+    with _fragmentos_lock:
+        if clave not in _fragmentos:
+            _fragmentos[clave] = html
+            _fragmentos_stats["bytes"] += len(html.encode("utf-8"))
+        while _fragmentos_stats["bytes"] > FRAGMENTOS_MAX_BYTES and len(_fragmentos) > 1:
+            _, viejo = _fragmentos.popitem(last=False)
+            _fragmentos_stats["bytes"] -= len(viejo.encode("utf-8"))
+            _fragmentos_stats["expulsiones"] += 1
+    return html
+
+def estadisticas_fragmentos() -> dict:
+    with _fragmentos_lock:
+        return dict(_fragmentos_stats, entradas=len(_fragmentos), max_bytes=FRAGMENTOS_MAX_BYTES)
+
+def _dirs_en_comparativas():
+    return _refrescar_carpetas()
 
 def _clean_segment(seg: str) -> str:
     s = seg.lower().strip()
@@ -238,35 +464,75 @@ def _clean_segment(seg: str) -> str:
     s = re.sub(r"-{2,}", "-", s).strip("-")
     return s
 
-def _match_slug_en_dirs(slug_base: str, dirs: list[str]) -> str | None:
+""" Tabla de resolución de slugs, construida una vez a partir de los nombres de las carpetas de Comparativas y rehecha
+solo cuando cambia la lista de grados: carpetas exactas, nombres amigables, prefijos de carpeta antes de "_" (con y sin
+"grado-"/"grado_", en variante con guiones o con guiones bajos) y los nombres sin separadores ordenados para buscar por
+prefijo con bisect. Da los mismos resultados que comparar el slug contra cada carpeta, pero cada búsqueda es un acceso a
+diccionario, y además se memorizan las entradas ya resueltas (URLs, nombres o slugs del Excel y del formulario). """
+MAX_RESUELTOS = 10_000
+CODIGO_FINAL_RE = re.compile(r"[_-]\d{3,}$")
+SEPARADORES_RE = re.compile(r"[-_]+")
+_tabla_slugs = {"mtime_ns": None}
+
+def _construir_tabla_slugs(dirs: list[str]) -> dict:
+    amigables, prefijos_hy, prefijos_us = {}, {}, {}
+    for d in dirs:
+        amigables.setdefault(_indice["nombres"].get(d, "").lower(), d)
+        for pos in (i for i, ch in enumerate(d) if ch == "_"):
+            clave = d[:pos]
+            if "_" not in clave:
+                prefijos_hy.setdefault(clave, set()).add(d)
+            if "-" not in clave:
+                prefijos_us.setdefault(clave, set()).add(d)
+            resto = d[6:pos]
+            if d.startswith("grado-") and resto and "_" not in resto:
+                prefijos_hy.setdefault(resto, set()).add(d)
+            if d.startswith("grado_") and resto and "-" not in resto:
+                prefijos_us.setdefault(resto, set()).add(d)
+    normalizados = sorted((SEPARADORES_RE.sub("", d), d) for d in dirs)
+    return {
+        "dirs": set(dirs), "amigables": amigables, "prefijos_hy": prefijos_hy, "prefijos_us": prefijos_us,
+        "normalizados": normalizados, "claves_norm": [n for n, _ in normalizados],
+        "con_codigo": {d for d in dirs if CODIGO_FINAL_RE.search(d)}, "resueltos": {},
+    }
+
+def tabla_slugs() -> dict:
+    """ Tabla al día con la lista de grados. Una tabla nueva se construye aparte y se publica en una sola asignación,
+    así que una petición concurrente ve la anterior o la nueva, nunca una a medio rellenar. """
+    global _tabla_slugs
+    _dirs_en_comparativas()
+    with _indice_lock:
+        dirs, mtime = _indice["carpetas"], _indice["mtime_ns"]
+    tabla = _tabla_slugs
+    if tabla["mtime_ns"] != mtime or "dirs" not in tabla:
+        tabla = _construir_tabla_slugs(dirs)
+        tabla["mtime_ns"] = mtime
+        _tabla_slugs = tabla
+    return tabla
+
+def _match_slug(slug_base: str, tabla: dict) -> str | None:
     if not slug_base:
         return None
     s = slug_base.strip().lower()
     s = re.sub(r"[-_]\d{3,}$", "", s)
     hy = s.replace("_", "-")
     us = s.replace("-", "_")
-    candidates = [
-        d for d in dirs
-        if d == s or d == hy or d == us
-        or d.startswith(hy + "_") or d.startswith(us + "_")
-        or d.startswith("grado-" + hy + "_") or d.startswith("grado_" + us + "_")
-    ]
+    candidates = {c for c in (s, hy, us) if c in tabla["dirs"]}
+    candidates |= tabla["prefijos_hy"].get(hy, set()) | tabla["prefijos_us"].get(us, set())
     if not candidates:
-        norm = re.sub(r"[-_]+", "", s)
-        for d in dirs:
-            if re.sub(r"[-_]+", "", d).startswith(norm):
-                candidates.append(d)
+        norm = SEPARADORES_RE.sub("", s)
+        claves = tabla["claves_norm"]
+        i = bisect.bisect_left(claves, norm)
+        while i < len(claves) and claves[i].startswith(norm):
+            candidates.add(tabla["normalizados"][i][1])
+            i += 1
     if not candidates:
         return None
-    with_code = [d for d in candidates if re.search(r"[_-]\d{3,}$", d)]
-    return sorted(with_code or candidates)[0]
+    with_code = candidates & tabla["con_codigo"]
+    return min(with_code or candidates)
 
-def resolver_carpeta(entrada: str) -> str:
-    s = (entrada or "").strip()
-    dirs = _dirs_en_comparativas()
-    if not s or not dirs:
-        return s
-    if s in dirs:
+def _resolver(s: str, tabla: dict) -> str:
+    if s in tabla["dirs"]:
         return s
     if "://" in s:
         path = urlparse(s).path
@@ -278,32 +544,208 @@ def resolver_carpeta(entrada: str) -> str:
             base = _clean_segment(raw)
             if not base or base in STOP_SEGMENTS:
                 continue
-            found = _match_slug_en_dirs(base, dirs)
+            found = _match_slug(base, tabla)
             if found:
                 return found
         return _clean_segment(segs[-1]) if segs else s
-    bonito_key = s.lower()
-    for d in dirs:
-        if nombre_amigable_carpeta(d).lower() == bonito_key:
-            return d
-    found = _match_slug_en_dirs(s, dirs)
+    amigable = tabla["amigables"].get(s.lower())
+    if amigable:
+        return amigable
+    found = _match_slug(s, tabla)
     return found or s
 
-def _detectar_columna_entrada(df_: pd.DataFrame) -> str | None:
+def resolver_carpeta(entrada: str) -> str:
+    s = (entrada or "").strip()
+    tabla = tabla_slugs()
+    if not s or not tabla["dirs"]:
+        return s
+    resueltos = tabla["resueltos"]
+    if s not in resueltos:
+        if len(resueltos) >= MAX_RESUELTOS:
+            resueltos.clear()
+        resueltos[s] = _resolver(s, tabla)
+    return resueltos[s]
+
+def _detectar_columna_entrada(columnas: list[str]) -> str | None:
     candidates = ["URL", "Url", "Enlace", "Link", "Slug", "Carpeta", "Grado URL"]
     for c in candidates:
-        if c in df_.columns:
+        if c in columnas:
             return c
     for c in ["Grado", "Título", "Titulo", "Nombre", "Nombre Grado"]:
-        if c in df_.columns:
+        if c in columnas:
             return c
     return None
 
-def _extraer_codigo_desde_entrada(valor: str) -> str:
-    carpeta = resolver_carpeta(valor)
+def _codigo_de_carpeta(carpeta: str) -> str:
     m = re.search(r"(\d{3,})$", carpeta or "")
     return m.group(1) if m else ""
 
+def _extraer_codigo_desde_entrada(valor: str) -> str:
+    return _codigo_de_carpeta(resolver_carpeta(valor))
+
+""" Filas de cada biblioteca con la carpeta de Comparativas y el CÓDIGO ya resueltos. Se calculan una vez y solo se
+rehacen si cambia la lista de grados de Comparativas, así que seleccionar una biblioteca es buscar en un diccionario. """
+_grados_por_biblioteca = {"mtime_ns": None, "bibliotecas": None}
+
+def _resolver_filas_grados() -> dict[str, list[dict]]:
+    col_entrada = _detectar_columna_entrada(_tabla_grados["columnas"])
+    carpetas = set(_dirs_en_comparativas())
+    filas = []
+    for fila in _tabla_grados["filas"]:
+        fila = dict(fila)
+        carpeta = resolver_carpeta(str(fila.get(col_entrada) or "")) if col_entrada else ""
+        fila["carpeta"] = carpeta if carpeta in carpetas else ""
+        fila["CÓDIGO"] = _codigo_de_carpeta(carpeta)
+        filas.append(fila)
+    return {b: [filas[i] for i in indices] for b, indices in _tabla_grados["bibliotecas"].items()}
+
+def grados_de_biblioteca(biblioteca: str) -> list[dict]:
+    """ Filas del Excel de grados atendidas por `biblioteca` (la columna admite varias separadas por "+"), con su CÓDIGO
+    y su carpeta de Comparativas ("" si no tiene). """
+    _refrescar_carpetas()
+    if _grados_por_biblioteca["bibliotecas"] is None or _grados_por_biblioteca["mtime_ns"] != _indice["mtime_ns"]:
+        _grados_por_biblioteca["bibliotecas"] = _resolver_filas_grados()
+        _grados_por_biblioteca["mtime_ns"] = _indice["mtime_ns"]
+    return _grados_por_biblioteca["bibliotecas"].get(biblioteca, [])
+
+# ---------- HTTP: ETags, compresión y estáticos con huella ----------
+
+""" Los datos solo cambian cuando se ejecuta comparar.py, así que las respuestas que dependen del índice llevan un ETag
+fuerte derivado de las huellas (firma en disco) de los grados que leen, tomadas de las mismas entradas del índice con
+las que se genera el cuerpo: así un ETag nunca corresponde a dos cuerpos distintos aunque otra petición refresque el
+índice entre medias. Va también la marca del arranque, porque el formato de las respuestas puede cambiar con cada
+despliegue. Se contesta 304 si el navegador ya tiene ese ETag. El HTML, JSON, CSS y JS se comprimen con brotli (si está instalado) o
+gzip. Los estáticos se enlazan con ?v=<huella del contenido> y, pedidos así, se sirven con caché de un año. """
+_ARRANQUE = format(time.time_ns(), "x")
+TIPOS_COMPRIMIBLES = {"text/html", "text/css", "text/plain", "text/csv", "application/json", "application/javascript",
+                      "text/javascript", "image/svg+xml"}
+MIN_BYTES_COMPRIMIR = 512
+CACHE_ESTATICOS = 365 * 24 * 3600
+_huellas_estaticos: dict[str, tuple[int, str]] = {}
+
+def version_indice() -> str:
+    return f"{_ARRANQUE}-{_indice['version']}"
+
+def _etag(*partes) -> str:
+    return hashlib.sha1(repr((_ARRANQUE,) + partes).encode("utf-8")).hexdigest()[:24]
+
+def respuesta_condicional(etag: str, generar):
+    """ 304 si el cliente ya tiene `etag` (en cualquiera de sus variantes comprimidas); si no, genera la respuesta. """
+    if any(request.if_none_match.contains(etag + sufijo) for sufijo in ("", "-br", "-gzip")):
+        resp = app.response_class(status=304)
+    else:
+        resp = make_response(generar())
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+""" Si se ha ejecutado construir_estaticos.py, static/build/manifest.json indica la hoja de estilos compilada y las
+variantes del logo; sus nombres ya llevan la huella, así que se sirven como inmutables sin ?v=. """
+MANIFEST_ESTATICOS = os.path.join(app.static_folder, "build", "manifest.json")
+# Solo los archivos con huella (nombre.<hash>.ext) son inmutables; manifest.json no
+ESTATICO_CON_HUELLA_RE = re.compile(r"^build/[^/]+\.[0-9a-f]{10}\.[a-z0-9]+$")
+
+def _cargar_manifest_estaticos() -> dict:
+    try:
+        with open(MANIFEST_ESTATICOS, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+_estaticos = _cargar_manifest_estaticos()
+
+@app.context_processor
+def _contexto_estaticos():
+    return {"hoja_estilos": _estaticos.get("style.css", "style.css"), "logo": _estaticos.get("logo")}
+
+def huella_estatico(filename: str) -> str:
+    ruta = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.stat(ruta).st_mtime_ns
+    except OSError:
+        return ""
+    previa = _huellas_estaticos.get(filename)
+    if previa and previa[0] == mtime:
+        return previa[1]
+    with open(ruta, "rb") as f:
+        huella = hashlib.sha1(f.read()).hexdigest()[:12]
+    _huellas_estaticos[filename] = (mtime, huella)
+    return huella
+
+@app.url_defaults
+def _url_estatico_con_huella(endpoint, values):
+    if endpoint == "static" and "filename" in values and "v" not in values \
+            and not values["filename"].startswith("build/"):
+        huella = huella_estatico(values["filename"])
+        if huella:
+            values["v"] = huella
+
+def _comprimir(resp):
+    aceptadas = request.accept_encodings
+    if brotli is not None and aceptadas["br"]:
+        return "br", lambda datos: brotli.compress(datos, quality=5)
+    if aceptadas["gzip"]:
+        return "gzip", lambda datos: gzip.compress(datos, compresslevel=6)
+    return None, None
+
+@app.after_request
+def _cabeceras_http(resp):
+    if request.endpoint == "static":
+        filename = request.view_args.get("filename", "")
+        if ESTATICO_CON_HUELLA_RE.match(filename) or (request.args.get("v") and request.args.get("v") == huella_estatico(filename)):
+            resp.headers["Cache-Control"] = f"public, max-age={CACHE_ESTATICOS}, immutable"
+    # Las respuestas en streaming (generadores) se dejan tal cual; los estáticos (archivo) sí se comprimen
+    if (resp.status_code != 200 or resp.mimetype not in TIPOS_COMPRIMIBLES
+            or (resp.is_streamed and not resp.direct_passthrough) or "Content-Encoding" in resp.headers):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    codificacion, comprimir = _comprimir(resp)
+    if codificacion is None:
+        return resp
+    etag, debil = resp.get_etag()
+    if request.endpoint == "static" and etag:
+        return _estatico_comprimido(resp, etag, codificacion, comprimir)
+    resp.direct_passthrough = False
+    datos = resp.get_data()
+    if len(datos) < MIN_BYTES_COMPRIMIR:
+        return resp
+    resp.set_data(comprimir(datos))
+    resp.headers["Content-Encoding"] = codificacion
+    if etag:
+        resp.set_etag(f"{etag}-{codificacion}", weak=debil)
+    return resp
+
+""" Un estático se comprime una sola vez por contenido (su ETag) y codificación. El cliente revalida con el ETag de la
+variante comprimida, que send_file no reconoce, así que el 304 de esa variante se responde aquí. """
+ESTATICOS_COMPRIMIDOS_MAX = 256
+_estaticos_comprimidos: dict[tuple[str, str], bytes | None] = {}
+
+def _estatico_comprimido(resp, etag: str, codificacion: str, comprimir):
+    etag_variante = f"{etag}-{codificacion}"
+    clave = (etag, codificacion)
+    if clave not in _estaticos_comprimidos:
+        if len(_estaticos_comprimidos) >= ESTATICOS_COMPRIMIDOS_MAX:
+            _estaticos_comprimidos.clear()
+        resp.direct_passthrough = False
+        datos = resp.get_data()
+        _estaticos_comprimidos[clave] = comprimir(datos) if len(datos) >= MIN_BYTES_COMPRIMIR else None
+    comprimido = _estaticos_comprimidos[clave]
+    if comprimido is None:
+        return resp
+    resp.close()
+    if request.if_none_match.contains(etag_variante):
+        no_modificado = app.response_class(status=304)
+        for cabecera in ("Cache-Control", "Expires", "Last-Modified", "Vary"):
+            if cabecera in resp.headers:
+                no_modificado.headers[cabecera] = resp.headers[cabecera]
+        no_modificado.set_etag(etag_variante)
+        return no_modificado
+    resp.direct_passthrough = False
+    resp.set_data(comprimido)
+    resp.headers["Content-Encoding"] = codificacion
+    resp.set_etag(etag_variante)
+    return resp
+
 # ---------- Rutas ----------
 
 @app.route("/", methods=["GET", "POST"])
@@ -311,7 +753,7 @@ def index():
     mensaje = ""
     feedback = ""
     contenido = ""
-    grados_filtrados = pd.DataFrame()
+    grados_filtrados = []
     seleccion = ""
 
     if request.method == "POST":
@@ -324,31 +766,9 @@ def index():
 
             secciones = []
             for carpeta in nombres_carpetas:
-                ruta = os.path.join(BASE_PATH, carpeta)
-                if os.path.exists(ruta):
-                    titulo_grado = nombre_amigable_carpeta(carpeta)
-                    secciones.append(f"<h2>{titulo_grado}</h2>")
-                    try:
-                        archivos = sorted(os.listdir(ruta))
-                    except Exception:
-                        archivos = []
-                    archivos_ordenados = extraer_cambios_y_ordenar(archivos, ruta)
-                    for archivo, cambios, contenido_txt in archivos_ordenados:
-                        titulo, codigo = parsear_titulo_y_codigo(archivo)
-                        izquierda = f"{titulo} ({codigo})" if codigo else titulo
-                        contenido_html = _preparar_contenido(contenido_txt)
-                        secciones.append(
-                            f"""
-<details class="cmp">
-  <summary class="toc">
-    <span class="cmp-left">{izquierda}</span>
-    <span class="toc-leader" aria-hidden="true"></span>
-    <span class="cmp-changes">nº cambios {cambios}</span>
-  </summary>
-  <pre>{contenido_html}</pre>
-</details>
-""".strip()
-                        )
+                grado = grado_indexado(carpeta)
+                if grado is not None:
+                    secciones.append(fragmento_grado(carpeta, grado))
                 else:
                     secciones.append(f"<p class='no-resultados'>❌ No se encontró la carpeta: {carpeta}</p>")
 
@@ -357,27 +777,490 @@ def index():
 
         elif seleccion:
             mensaje = f"📚 Has seleccionado: {seleccion}"
-            if not df.empty and "Biblioteca" in df.columns:
-                grados_filtrados = df[
-                    df['Biblioteca'].fillna('').str.split(r'\s*\+\s*').apply(lambda bibl_list: seleccion in bibl_list)
-                ].copy()
-                col_entrada = _detectar_columna_entrada(grados_filtrados)
-                if col_entrada:
-                    grados_filtrados["CÓDIGO"] = grados_filtrados[col_entrada].apply(_extraer_codigo_desde_entrada)
-                else:
-                    grados_filtrados["CÓDIGO"] = ""
+            grados_filtrados = grados_de_biblioteca(seleccion)
+
+    def generar():
+        return render_template(
+            "index.html",
+            bibliotecas=bibliotecas,
+            mensaje=mensaje,
+            feedback=feedback,
+            seleccion=seleccion,
+            grados=grados_filtrados,
+            contenido=contenido
+        )
+
+    if request.method == "GET":
+        # La portada sin formulario no depende de los datos: solo cambia al reiniciar (plantillas/estáticos nuevos).
+        # Con un 304 ni siquiera se renderiza la plantilla
+        return respuesta_condicional(_etag("portada"), generar)
+    return generar()
+
+""" La página solo lleva las filas resumen (título, código, nº de cambios); el cuerpo de cada comparativa se pide a
+esta ruta al desplegarla, ya preparado (sin cabeceras y con enlaces) y, con la opción "Justificar", justificado a ancho
+fijo. Con formato=json se devuelve el mismo HTML junto con los datos de la fila. """
+@app.route("/comparativa")
+def comparativa():
+    carpeta = request.args.get("carpeta", "")
+    archivo = request.args.get("archivo", "")
+    # Solo se sirven archivos que estén en el índice de Comparativas (nada de rutas arbitrarias)
+    grado = grado_indexado(carpeta)
+    if grado is None or archivo not in grado["asignaturas"]:
+        abort(404)
+    justificar = request.args.get("justificar") == "1"
+    ancho = min(max(request.args.get("ancho", JUSTIFY_WIDTH, type=int), 40), 200)
+    formato = request.args.get("formato", "html")
+    asignatura = grado["asignaturas"][archivo]
+    try:
+        # El cuerpo se lee del disco (leer_cuerpo), así que el ETag sale del archivo y no del índice, que puede estar
+        # congelado mientras un trabajo reescribe las Comparativas
+        st = os.stat(os.path.join(BASE_PATH, carpeta, archivo))
+    except OSError:
+        abort(404)
+
+    def generar():
+        html = _preparar_cuerpo(leer_cuerpo(carpeta, asignatura), justificar=justificar, ancho=ancho)
+        if formato == "json":
+            return jsonify({
+                "carpeta": carpeta, "archivo": archivo, "titulo": asignatura["titulo"], "codigo": asignatura["codigo"],
+                "cambios": asignatura["cambios"], "n_eliminados": asignatura["n_eliminados"],
+                "n_anadidos": asignatura["n_anadidos"], "html": html,
+            })
+        return html
+
+    return respuesta_condicional(_etag("comparativa", carpeta, archivo, st.st_mtime_ns, st.st_size, grado["huella"],
+                                       justificar, ancho, formato), generar)
+
+@app.route("/estado")
+def estado():
+    """ Estado interno para diagnóstico: versión del índice y aciertos/fallos de la caché de fragmentos. """
+    return jsonify({
+        "indice": {"version": version_indice(), "grados": len(_indice["carpetas"])},
+        "fragmentos": estadisticas_fragmentos(),
+    })
+
+# ---------- API JSON de solo lectura (v1) ----------
+
+""" API versionada para clientes por lotes, servida desde el mismo índice en memoria que la página. Los listados admiten
+filtros (min_cambios, prefijo de código, rango de porcentaje pct_min/pct_max) y paginación por cursor: el cursor es la
+clave de orden del último elemento devuelto, así que una página no se desplaza aunque el índice cambie entre peticiones.
+Cada ruta refresca primero los grados que cubre y calcula el ETag con sus huellas; el campo "version" de la respuesta es
+ese mismo ETag. """
+API_V1 = "/api/v1"
+LIMITE_API = 100
+LIMITE_API_MAX = 1000
+
+class ErrorAPI(ValueError):
+    def __init__(self, mensaje: str, estado: int = 400):
+        super().__init__(mensaje)
+        self.estado = estado
+
+@app.errorhandler(ErrorAPI)
+def _error_api(e):
+    return jsonify({"error": str(e)}), e.estado
+
+@app.errorhandler(404)
+def _no_encontrado(e):
+    # Dentro de la API los errores también son JSON (rutas inexistentes incluidas)
+    if request.path.startswith(API_V1 + "/"):
+        return jsonify({"error": "No encontrado"}), 404
+    return e
+
+def _param_numero(nombre: str, tipo=float, defecto=None):
+    valor = request.args.get(nombre)
+    if valor is None or valor == "":
+        return defecto
+    try:
+        return tipo(valor)
+    except ValueError:
+        raise ErrorAPI(f"Parámetro {nombre} no válido: {valor!r}")
+
+def _filtros_api() -> dict:
+    return {
+        "min_cambios": _param_numero("min_cambios", int, 0),
+        "prefijo": request.args.get("prefijo", "").strip(),
+        "pct_min": _param_numero("pct_min", float, 0.0),
+        "pct_max": _param_numero("pct_max", float, 100.0),
+    }
+
+def _pasa_filtros(item: dict, filtros: dict) -> bool:
+    return (item["cambios"] >= filtros["min_cambios"]
+            and (item["codigo"] or "").startswith(filtros["prefijo"])
+            and filtros["pct_min"] <= item["porcentaje"] <= filtros["pct_max"])
+
+def _codificar_cursor(clave: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(clave, ensure_ascii=False).encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decodificar_cursor(cursor: str) -> list:
+    try:
+        clave = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ErrorAPI("Cursor no válido")
+    if not isinstance(clave, list):
+        raise ErrorAPI("Cursor no válido")
+    return clave
+
+def _paginar(items: list[dict], clave) -> dict:
+    """ `items` ya ordenados por `clave`; devuelve la página pedida y el cursor de la siguiente (o None). """
+    limite = min(max(_param_numero("limite", int, LIMITE_API), 1), LIMITE_API_MAX)
+    total = len(items)
+    cursor = request.args.get("cursor")
+    if cursor:
+        desde = _decodificar_cursor(cursor)
+        try:
+            items = [it for it in items if list(clave(it)) > desde]
+        except TypeError:
+            raise ErrorAPI("Cursor no válido")
+    pagina = items[:limite]
+    siguiente = _codificar_cursor(list(clave(pagina[-1]))) if len(items) > limite else None
+    return {"total": total, "items": pagina, "siguiente": siguiente}
+
+def _resumen_grado(carpeta: str, grado: dict | None) -> dict:
+    asignaturas = list(grado["asignaturas"].values()) if grado else []
+    return {
+        "carpeta": carpeta if grado else None,
+        "nombre": grado["nombre"] if grado else None,
+        "codigo": _codigo_de_carpeta(carpeta) if grado else "",
+        "n_asignaturas": len(asignaturas),
+        "cambios": sum(a["cambios"] for a in asignaturas),
+        "porcentaje": round(sum(a["porcentaje"] for a in asignaturas) / len(asignaturas), 2) if asignaturas else 0.0,
+    }
+
+def _api_json(datos, generar):
+    """ `datos`: lo que se ha leído del índice para esta respuesta (huellas de grados, carpetas); `generar` tiene que
+    construir el cuerpo solo a partir de eso. """
+    etag = _etag("api", request.full_path, datos)
+    return respuesta_condicional(etag, lambda: jsonify({"version": etag, **generar()}))
+
+@app.route(f"{API_V1}/bibliotecas")
+def api_bibliotecas():
+    n_grados = {b: len(grados_de_biblioteca(b)) for b in bibliotecas}
+
+    def generar():
+        return {"items": [{"nombre": b, "n_grados": n_grados[b]} for b in bibliotecas]}
+    return _api_json(sorted(n_grados.items()), generar)
+
+@app.route(f"{API_V1}/bibliotecas/<path:biblioteca>/grados")
+def api_grados_biblioteca(biblioteca):
+    if biblioteca not in bibliotecas:
+        raise ErrorAPI(f"Biblioteca desconocida: {biblioteca}", 404)
+    filtros = _filtros_api()
+    filas = grados_de_biblioteca(biblioteca)
+    grados = {fila["carpeta"]: grado_indexado(fila["carpeta"]) for fila in filas}
+
+    def generar():
+        items = []
+        for n, fila in enumerate(filas):
+            carpeta = fila["carpeta"]
+            item = {"grado": str(fila.get("Grado", "")), "centro": fila.get("Centro", ""), "url": fila.get("URL", ""),
+                    "fila": n, **_resumen_grado(carpeta, grados[carpeta])}
+            if _pasa_filtros(item, filtros):
+                items.append(item)
+        # La fila de la tabla de grados desempata (varios grados pueden tener el mismo nombre y 0 cambios)
+        clave = lambda it: (-it["cambios"], it["grado"], it["fila"])
+        items.sort(key=clave)
+        return _paginar(items, clave)
+    return _api_json([(c, g and g["huella"]) for c, g in grados.items()], generar)
+
+@app.route(f"{API_V1}/grados")
+def api_grados():
+    filtros = _filtros_api()
+    grados = {c: grado_indexado(c) for c in _refrescar_carpetas()}
+
+    def generar():
+        items = [_resumen_grado(c, g) for c, g in grados.items()]
+        items = [it for it in items if _pasa_filtros(it, filtros)]
+        clave = lambda it: (-it["cambios"], it["carpeta"])
+        items.sort(key=clave)
+        return _paginar(items, clave)
+    return _api_json([(c, g and g["huella"]) for c, g in grados.items()], generar)
+
+@app.route(f"{API_V1}/grados/<carpeta>/asignaturas")
+def api_asignaturas(carpeta):
+    grado = grado_indexado(carpeta)
+    if grado is None:
+        raise ErrorAPI(f"Grado desconocido: {carpeta}", 404)
+    filtros = _filtros_api()
+
+    def generar():
+        items = []
+        for archivo in grado["orden"]:
+            a = grado["asignaturas"][archivo]
+            if _pasa_filtros(a, filtros):
+                items.append({k: a[k] for k in ("archivo", "titulo", "codigo", "n_eliminados", "n_comunes",
+                                                "n_anadidos", "cambios", "porcentaje")})
+        clave = lambda it: (-it["cambios"], it["archivo"].lower(), it["archivo"])
+        return _paginar(items, clave)
+    return _api_json(grado["huella"], generar)
+
+# ---------- Exportación de cambios por biblioteca ----------
+
+""" Para planificar las actualizaciones en Leganto: todas las asignaturas de los grados de una biblioteca con su código,
+grado y contadores, y una fila por cada recurso añadido o eliminado (los recursos salen del .json de cada comparativa vía
+comparar.leer_comparativa). El CSV se genera fila a fila en una respuesta en streaming, así que nunca está entero en
+memoria. El XLSX es un zip y no se puede emitir por trozos: se escribe con openpyxl en modo write_only (fila a fila) a
+un archivo temporal y se sirve desde disco. """
+COLUMNAS_EXPORTACION = ["Biblioteca", "Grado", "Carpeta", "Código", "Asignatura", "Eliminados", "Sin cambios",
+                        "Añadidos", "Porcentaje", "Cambio", "Recurso"]
+CAMBIOS_EXPORTACION = (("anadidos", "Añadido"), ("eliminados", "Eliminado"))
+TAM_TROZO_CSV = 64 * 1024
+# Una celda que empieza por uno de estos caracteres la interpretan Excel/LibreOffice (y openpyxl) como fórmula
+INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+def _celda_segura(valor):
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+def filas_exportacion(biblioteca: str):
+    """ Genera las filas (listas) de la exportación de `biblioteca`, grado a grado y asignatura a asignatura. """
+    vistos = set()
+    for fila in grados_de_biblioteca(biblioteca):
+        carpeta = fila["carpeta"]
+        grado = grado_indexado(carpeta) if carpeta and carpeta not in vistos else None
+        if grado is None:
+            continue
+        vistos.add(carpeta)
+        for archivo in grado["orden"]:
+            a = grado["asignaturas"].get(archivo)
+            if a is None:
+                continue
+            base = [biblioteca, grado["nombre"], carpeta, a["codigo"], a["titulo"], a["n_eliminados"], a["n_comunes"],
+                    a["n_anadidos"], a["porcentaje"]]
+            recursos = []
+            if a["cambios"]:
+                try:
+                    secciones = comparar.leer_comparativa(os.path.join(BASE_PATH, carpeta, archivo))
+                except OSError:
+                    secciones = {}
+                recursos = [(etiqueta, r) for clave, etiqueta in CAMBIOS_EXPORTACION for r in secciones.get(clave, [])]
+            base = [_celda_segura(v) for v in base]
+            if not recursos:
+                yield base + ["", ""]
+            for etiqueta, recurso in recursos:
+                yield base + [etiqueta, _celda_segura(recurso)]
+
+def _csv_en_streaming(filas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    yield "\ufeff"  # BOM para que Excel abra el CSV como UTF-8
+    escritor.writerow(COLUMNAS_EXPORTACION)
+    for fila in filas:
+        escritor.writerow(fila)
+        if buffer.tell() >= TAM_TROZO_CSV:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _xlsx_temporal(filas):
+    from openpyxl import Workbook  # solo se importa si se pide un XLSX
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Cambios")
+    hoja.append(COLUMNAS_EXPORTACION)
+    for fila in filas:
+        hoja.append(fila)
+    archivo = tempfile.TemporaryFile(suffix=".xlsx")
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+def _nombre_exportacion(biblioteca: str, extension: str) -> str:
+    slug = re.sub(r"[^0-9A-Za-z]+", "_", unicodedata.normalize("NFKD", biblioteca).encode("ascii", "ignore").decode())
+    return f"cambios_{slug.strip('_')}.{extension}"
+
+@app.route("/exportar")
+def exportar():
+    biblioteca = request.args.get("biblioteca", "")
+    formato = request.args.get("formato", "csv")
+    if biblioteca not in bibliotecas or formato not in ("csv", "xlsx"):
+        abort(404)
+    if formato == "xlsx":
+        return send_file(_xlsx_temporal(filas_exportacion(biblioteca)), as_attachment=True,
+                         download_name=_nombre_exportacion(biblioteca, "xlsx"),
+                         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    resp = Response(stream_with_context(_csv_en_streaming(filas_exportacion(biblioteca))),
+                    mimetype="text/csv", content_type="text/csv; charset=utf-8")
+    resp.headers["Content-Disposition"] = f"attachment; filename={_nombre_exportacion(biblioteca, 'csv')}"
+    return resp
+
+# ---------- Búsqueda de texto completo ----------
+
+""" El índice SQLite FTS5 de buscador.py (cursos + Comparativas) se actualiza en segundo plano: al arrancar y cada vez
+que cambia la versión del índice de Comparativas. Mientras se actualiza se sigue buscando en la versión anterior. """
+_busqueda_lock = threading.Lock()
+_busqueda = {"version": None, "en_curso": False, "listo": os.path.exists(buscador.BUSQUEDA_PATH)}
+
+def _actualizar_busqueda(version: str):
+    try:
+        buscador.actualizar_indice()
+        _busqueda["version"] = version
+        _busqueda["listo"] = True
+    except Exception as e:
+        print(f"⚠️ No se pudo actualizar el índice de búsqueda: {e}")
+    finally:
+        _busqueda["en_curso"] = False
+
+def actualizar_busqueda_en_segundo_plano():
+    version = version_indice()
+    with _busqueda_lock:
+        if _busqueda["en_curso"] or _busqueda["version"] == version:
+            return
+        _busqueda["en_curso"] = True
+    threading.Thread(target=_actualizar_busqueda, args=(version,), daemon=True).start()
+
+def _fragmento_html(fragmento: str) -> str:
+    return escape(fragmento).replace(buscador.MARCA_INICIO, "<mark>").replace(buscador.MARCA_FIN, "</mark>")
+
+@app.route("/buscar")
+def buscar():
+    texto = request.args.get("q", "").strip()
+    limite = min(max(request.args.get("limite", buscador.LIMITE_BUSQUEDA, type=int), 1), 100)
+    actualizar_busqueda_en_segundo_plano()
+    items = []
+    for r in buscador.buscar(texto, limite, request.args.get("fuente") or None) if _busqueda["listo"] else []:
+        r["fragmento_html"] = _fragmento_html(r.pop("fragmento"))
+        r["comparativa"] = r["fuente"] == os.path.basename(BASE_PATH)
+        items.append(r)
+    estado = "listo" if _busqueda["listo"] else "construyendo"
+    return jsonify({"q": texto, "estado": estado, "items": items})
+
+# ---------- Trabajos en segundo plano (extracción y comparación) ----------
+
+""" La extracción de guías (extraer_bibliografia_toda_ugr.main) y la generación de comparativas (comparar.main) se
+pueden lanzar desde la web, con como mucho un trabajo en curso por tipo. Cada uno corre en un proceso aparte
+(ejecutar_trabajo.py, para no hacer fork de este servidor con hilos) vigilado por un hilo que lee su progreso (el
+callback(porcentaje, etiqueta) de ambos main) y lo publica por Server-Sent Events en /trabajos/<tipo>/eventos.
+Como los dos escriben en Comparativas, mientras hay alguno en curso el índice en memoria se congela; al terminar se
+reconstruye aparte y se sustituye de golpe (sustituir_indice), así que la web no se para. Las comparativas se
+escriben con renombrado atómico y leer_cuerpo no se fía del offset de un archivo que ha cambiado, así que tampoco se
+sirven cuerpos a medias.
+Lanzar trabajos exige la variable de entorno TOKEN_TRABAJOS (cabecera X-Token o campo token); sin ella está
+desactivado. """
+TOKEN_TRABAJOS = os.environ.get("TOKEN_TRABAJOS", "")
+LATIDO_SSE = 15  # segundos entre comentarios "keep-alive" si no hay progreso
+
+EJECUTOR_TRABAJOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ejecutar_trabajo.py")
+TIPOS_TRABAJO = ("extraer", "comparar")
+
+def _ejecutar_en_proceso(tipo: str, callback):
+    """ Lanza ejecutar_trabajo.py y va pasando a `callback` el progreso que escribe en la tubería; devuelve su
+    resultado. """
+    lectura, escritura = os.pipe()
+    try:
+        proc = subprocess.Popen([sys.executable, EJECUTOR_TRABAJOS, tipo, str(escritura)], pass_fds=(escritura,))
+    finally:
+        os.close(escritura)
+    resultado = None
+    with os.fdopen(lectura, "r", encoding="utf-8") as canal:
+        for linea in canal:
+            try:
+                mensaje = json.loads(linea)
+            except ValueError:
+                continue
+            if "resultado" in mensaje:
+                resultado = mensaje["resultado"]
             else:
-                grados_filtrados = pd.DataFrame()
-
-    return render_template(
-        "index.html",
-        bibliotecas=bibliotecas,
-        mensaje=mensaje,
-        feedback=feedback,
-        seleccion=seleccion,
-        grados=grados_filtrados,
-        contenido=contenido
-    )
+                callback(mensaje["porcentaje"], mensaje["etiqueta"])
+    if proc.wait() != 0:
+        raise RuntimeError(f"ejecutar_trabajo.py {tipo} terminó con código {proc.returncode}")
+    return resultado
+_trabajos_cond = threading.Condition()
+_trabajos = {tipo: None for tipo in TIPOS_TRABAJO}
+
+def _estado_trabajo(tipo: str) -> dict:
+    return dict(_trabajos[tipo] or {"tipo": tipo, "estado": "nunca"})
+
+def _actualizar_trabajo(tipo: str, **cambios):
+    with _trabajos_cond:
+        _trabajos[tipo] = {**_trabajos[tipo], **cambios, "seq": _trabajos[tipo]["seq"] + 1}
+        _trabajos_cond.notify_all()
+
+def _ejecutar_trabajo(tipo: str):
+    try:
+        resultado = _ejecutar_en_proceso(tipo, lambda pct, etiqueta: _actualizar_trabajo(tipo, porcentaje=pct,
+                                                                                        etiqueta=etiqueta))
+        _actualizar_trabajo(tipo, etiqueta="Actualizando índice…")
+        sustituir_indice()
+        _actualizar_trabajo(tipo, estado="terminado", porcentaje=100, etiqueta="Terminado", fin=time.time(),
+                            resultado=resultado if isinstance(resultado, dict) else None)
+    except Exception as e:
+        # Primero el estado: si no, un fallo al reindexar dejaría el trabajo "en_curso" (y el índice congelado) para
+        # siempre
+        print(f"⚠️ Error en el trabajo {tipo}: {e!r}")
+        _actualizar_trabajo(tipo, estado="error", error=repr(e), fin=time.time())
+        try:
+            sustituir_indice()
+        except Exception as e_indice:
+            print(f"⚠️ No se pudo reconstruir el índice tras el trabajo {tipo}: {e_indice!r}")
+    finally:
+        with _trabajos_cond:
+            if not any(t and t["estado"] == "en_curso" for t in _trabajos.values()):
+                _indice_congelado.clear()
+    actualizar_busqueda_en_segundo_plano()
+
+@app.context_processor
+def _contexto_trabajos():
+    return {"trabajos_habilitados": bool(TOKEN_TRABAJOS)}
+
+def lanzar_trabajo(tipo: str) -> dict | None:
+    """ Arranca un trabajo de `tipo` en segundo plano; None si ya hay uno en curso de ese tipo. """
+    with _trabajos_cond:
+        if _trabajos[tipo] and _trabajos[tipo]["estado"] == "en_curso":
+            return None
+        _trabajos[tipo] = {"tipo": tipo, "estado": "en_curso", "porcentaje": 0, "etiqueta": "Empezando…",
+                           "inicio": time.time(), "fin": None, "error": None, "resultado": None, "seq": 0}
+        _indice_congelado.set()
+        _trabajos_cond.notify_all()
+    threading.Thread(target=_ejecutar_trabajo, args=(tipo,), daemon=True).start()
+    return _estado_trabajo(tipo)
+
+def _token_valido() -> bool:
+    token = request.headers.get("X-Token") or request.form.get("token", "")
+    return bool(TOKEN_TRABAJOS) and hmac.compare_digest(token.encode("utf-8"), TOKEN_TRABAJOS.encode("utf-8"))
+
+@app.route("/trabajos")
+def trabajos():
+    return jsonify({tipo: _estado_trabajo(tipo) for tipo in TIPOS_TRABAJO})
+
+@app.route("/trabajos/<tipo>", methods=["POST"])
+def iniciar_trabajo(tipo):
+    if tipo not in TIPOS_TRABAJO:
+        abort(404)
+    if not _token_valido():
+        return jsonify({"error": "Token no válido o trabajos desactivados (TOKEN_TRABAJOS)"}), 403
+    estado = lanzar_trabajo(tipo)
+    if estado is None:
+        return jsonify({"error": f"Ya hay un trabajo «{tipo}» en curso", **_estado_trabajo(tipo)}), 409
+    return jsonify(estado), 202
+
+@app.route("/trabajos/<tipo>/eventos")
+def eventos_trabajo(tipo):
+    """ Server-Sent Events: un evento con el estado del trabajo cada vez que cambia, hasta que termina. """
+    if tipo not in TIPOS_TRABAJO:
+        abort(404)
+
+    def generar():
+        visto = -1  # el primer evento (estado actual) se envía enseguida
+        while True:
+            with _trabajos_cond:
+                _trabajos_cond.wait_for(lambda: (_trabajos[tipo] or {}).get("seq") != visto, timeout=LATIDO_SSE)
+                estado = _estado_trabajo(tipo)
+            if estado.get("seq") == visto:
+                yield ": latido\n\n"
+                continue
+            visto = estado.get("seq")
+            yield f"data: {json.dumps(estado, ensure_ascii=False)}\n\n"
+            if estado["estado"] != "en_curso":
+                return
+
+    resp = Response(stream_with_context(generar()), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+construir_indice()
+actualizar_busqueda_en_segundo_plano()
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", "10000"))
@@ -0,0 +1,334 @@
+""" Benchmarks de comparar.py.
+
+Modo "suite" (por defecto): genera bibliografías sintéticas a partir del corpus real de BibliografiasUGR a varias escalas
+(1x, 10x, 100x sobre una muestra de asignaturas), les aplica ediciones controladas (años que suben, editoriales que
+cambian, fragmentos reordenados) y mide por separado leer_recursos_txt, comparar_sets, escribir_comparativa y el main
+completo, con el tiempo de cada etapa y su pico de memoria. El resultado se guarda en JSON junto con el commit, para
+poder comparar ejecuciones entre commits (--comparar-con).
+
+Modo "indice": mide comparar_sets con el recorrido lineal original y con el índice de candidatos sobre los grados con
+más bibliografía, comprobando de paso que ambos caminos devuelven exactamente lo mismo.
+
+Si no existen las carpetas de curso (BASE_OLD / BASE_NEW), el corpus se reconstruye desde las comparativas ya
+generadas: el curso anterior son los recursos eliminados + sin cambios y el actual los sin cambios + añadidos.
+
+Uso: python benchmark_comparar.py [--modo suite|indice] [--asignaturas 100] [--escalas 1,10,100]
+                                  [--tasa-anio 0.1] [--tasa-editorial 0.05] [--tasa-orden 0.05]
+                                  [--salida resultados.json] [--comparar-con resultados_previos.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+
+import comparar
+from indice_carpetas import escanear_carpeta, split_degree_name_and_code_from_folder
+
+BENCH_DIR = "benchmarks"
+ETAPAS = ("leer_recursos_txt", "comparar_sets", "escribir_comparativa", "main")
+EDITORIALES = ("Pirámide", "Síntesis", "Paraninfo", "Ariel", "Tecnos", "Pearson", "McGraw-Hill", "Springer",
+               "Alianza Editorial", "Graó")
+EDITORIALES_RE = re.compile("|".join(re.escape(e) for e in EDITORIALES))
+
+# ====== Carga del corpus ======
+def corpus_desde_comparativas(raiz: str) -> list[tuple[str, str, str, set, set]]:
+    asignaturas = []
+    for sub, info in sorted(escanear_carpeta(raiz).items()):
+        nombre_grado, _ = split_degree_name_and_code_from_folder(sub)
+        for fn, nombre_asig, codigo in sorted(info["archivos"]):
+            if not codigo or fn.startswith(("Resumen_", "Informe_")):
+                continue
+            secciones = comparar.leer_comparativa(os.path.join(raiz, sub, fn))
+            asignaturas.append((codigo, nombre_asig, nombre_grado,
+                                set(secciones["eliminados"]) | set(secciones["comunes"]),
+                                set(secciones["comunes"]) | set(secciones["anadidos"])))
+    return asignaturas
+
+def cargar_corpus(ruta_old: str, ruta_new: str, ruta_comparativas: str) -> list[tuple[str, str, str, set, set]]:
+    """ [(codigo, asignatura, grado, recursos curso anterior, recursos curso actual)] ordenado por código. """
+    idx_old = comparar.index_year_folder(ruta_old)
+    idx_new = comparar.index_year_folder(ruta_new)
+    comunes = sorted(set(idx_old) & set(idx_new))
+    if not comunes:
+        return corpus_desde_comparativas(ruta_comparativas)
+    asignaturas = []
+    for codigo in comunes:
+        ruta_old_asig, _, _ = idx_old[codigo]
+        ruta_new_asig, nombre_asig, nombre_grado = idx_new[codigo]
+        asignaturas.append((codigo, nombre_asig, nombre_grado,
+                            comparar.leer_recursos_txt(ruta_old_asig), comparar.leer_recursos_txt(ruta_new_asig)))
+    return asignaturas
+
+# ====== Generación sintética ======
+def _subir_anio(ref: str, rng: random.Random) -> str:
+    anios = list(comparar.YEAR_RE.finditer(ref))
+    if not anios:
+        return ref
+    m = rng.choice(anios)
+    return ref[:m.start()] + str(int(m.group(0)) + 1) + ref[m.end():]
+
+def _cambiar_editorial(ref: str, rng: random.Random) -> str:
+    m = EDITORIALES_RE.search(ref)
+    if m:
+        otra = rng.choice([e for e in EDITORIALES if e != m.group(0)])
+        return ref[:m.start()] + otra + ref[m.end():]
+    return f"{ref}. {rng.choice(EDITORIALES)}"
+
+def _reordenar(ref: str, rng: random.Random) -> str:
+    partes = ref.split(". ")
+    if len(partes) < 3:
+        return ref
+    i, j = rng.sample(range(1, len(partes)), 2)
+    partes[i], partes[j] = partes[j], partes[i]
+    return ". ".join(partes)
+
+def editar_bibliografia(recursos: set, tasas: dict[str, float], rng: random.Random) -> list[str]:
+    """ Aplica a cada recurso, con su probabilidad, cada una de las ediciones y devuelve la lista barajada. """
+    ediciones = (("anio", _subir_anio), ("editorial", _cambiar_editorial), ("orden", _reordenar))
+    salida = []
+    for ref in sorted(recursos):
+        for clave, editar in ediciones:
+            if rng.random() < tasas[clave]:
+                ref = editar(ref, rng)
+        salida.append(ref)
+    rng.shuffle(salida)
+    return salida
+
+def _escribir_guia(ruta: str, codigo: str, nombre_asig: str, recursos: list[str]):
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(f"https://grados.ugr.es/guia/{codigo}\n")
+        f.write(f"Guía docente de {nombre_asig} ({codigo})\n")
+        for ref in recursos:
+            f.write(ref + "\n")
+
+def generar_espacio(destino: str, muestra: list, escala: int, tasas: dict[str, float], semilla: int) -> list[tuple]:
+    """ Crea en destino un árbol BibliografiasUGR/grados con las carpetas de ambos cursos: cada asignatura de la muestra
+    aparece `escala` veces (réplicas con código propio) y su guía actual lleva ediciones distintas en cada réplica.
+    Devuelve [(codigo, asignatura, grado, ruta_old, ruta_new)]. """
+    rng = random.Random(semilla)
+    trabajos = []
+    for codigo, nombre_asig, nombre_grado, rec_old, rec_new in muestra:
+        code3 = comparar.degree_code3_from_subject_code(codigo)
+        carpeta = f"{comparar.slugify_nombre(nombre_grado, use_underscores=False)}_{code3}"
+        for r in range(escala):
+            codigo_r = codigo if r == 0 else f"{codigo}R{r}"
+            fn = f"{comparar.slugify_nombre(nombre_asig)}_{codigo_r}.txt"
+            rutas = []
+            for curso, recursos in ((comparar.BASE_OLD, sorted(rec_old)),
+                                    (comparar.BASE_NEW, editar_bibliografia(rec_new, tasas, rng))):
+                os.makedirs(os.path.join(destino, curso, carpeta), exist_ok=True)
+                rutas.append(os.path.join(destino, curso, carpeta, fn))
+                _escribir_guia(rutas[-1], codigo_r, nombre_asig, recursos)
+            trabajos.append((codigo_r, nombre_asig, nombre_grado, rutas[0], rutas[1]))
+    return trabajos
+
+# ====== Medición ======
+def _limpiar_caches():
+    for funcion in (comparar.normalizar_recurso, comparar.parsear_referencia):
+        if hasattr(funcion, "cache_clear"):
+            funcion.cache_clear()
+    comparar.vaciar_catalogo()
+
+def medir_etapa(funcion, memoria: bool) -> dict:
+    """ Ejecuta funcion() con las cachés vacías y mide su tiempo; si memoria, la repite bajo tracemalloc para obtener
+    el pico de memoria (tracemalloc ralentiza mucho, así que no se mezcla con el tiempo). """
+    _limpiar_caches()
+    t0 = time.perf_counter()
+    elementos = funcion()
+    resultado = {"segundos": round(time.perf_counter() - t0, 4), "elementos": elementos}
+    if memoria:
+        _limpiar_caches()
+        tracemalloc.start()
+        try:
+            funcion()
+            resultado["pico_memoria_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return resultado
+
+def medir_escala(muestra: list, escala: int, tasas: dict[str, float], semilla: int, workers: int,
+                 memoria: bool) -> dict:
+    espacio = tempfile.mkdtemp(prefix="bench_comparar_")
+    cwd = os.getcwd()
+    try:
+        trabajos = generar_espacio(espacio, muestra, escala, tasas, semilla)
+        # comparar.py trabaja con rutas relativas a BibliografiasUGR: el main se ejecuta dentro del espacio temporal
+        os.chdir(espacio)
+        os.makedirs(comparar.COMPARATIVAS_BASE, exist_ok=True)
+        rutas = [(os.path.relpath(r_old, espacio), os.path.relpath(r_new, espacio)) for *_, r_old, r_new in trabajos]
+        leidos = []
+
+        def leer():
+            leidos[:] = [(comparar.leer_recursos_txt(a), comparar.leer_recursos_txt(b)) for a, b in rutas]
+            return sum(len(a) + len(b) for a, b in leidos)
+
+        resultados = []
+
+        def comparar_todo():
+            resultados[:] = [comparar.comparar_sets(a, b) for a, b in leidos]
+            return len(resultados)
+
+        def escribir():
+            destino = os.path.join(espacio, "escritura")
+            for (codigo, asig, grado, *_), (elim, com, anad, pct) in zip(trabajos, resultados):
+                comparar.escribir_comparativa(destino, grado, comparar.degree_code3_from_subject_code(codigo),
+                                              asig, codigo, elim, com, anad, pct)
+            return len(resultados)
+
+        pico_main = {}
+
+        def main_completo():
+            shutil.rmtree(comparar.COMPARATIVAS_BASE, ignore_errors=True)
+            os.makedirs(comparar.COMPARATIVAS_BASE)
+            # El main va en un proceso nuevo en cada escala: el rusage que devuelve wait4 es solo el de ese proceso y
+            # sus workers (RUSAGE_CHILDREN acumularía el máximo de todas las escalas anteriores)
+            proc = subprocess.Popen([sys.executable, "-c", "import sys, comparar; comparar.main(sys.argv[1:])",
+                                     "--forzar", "--sin-busqueda", "--workers", str(workers)],
+                                    env={**os.environ, "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))})
+            _, estado, uso = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(estado)
+            if proc.returncode:
+                raise subprocess.CalledProcessError(proc.returncode, proc.args)
+            pico_main["kib"] = uso.ru_maxrss
+            return len(trabajos)
+
+        etapas = {}
+        for nombre, funcion in zip(ETAPAS, (leer, comparar_todo, escribir, main_completo)):
+            print(f"⏱ {escala}x · {nombre}…")
+            etapas[nombre] = medir_etapa(funcion, memoria and nombre != "main")
+        # Pico de RSS (KiB en Linux) del proceso del main y de sus workers en esta escala
+        etapas["main"]["pico_rss_kib"] = pico_main.get("kib")
+        return {"escala": escala, "asignaturas": len(trabajos),
+                "recursos": etapas["leer_recursos_txt"]["elementos"], "etapas": etapas}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(espacio, ignore_errors=True)
+
+def _commit_actual() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        sucio = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "cambios_sin_commit": sucio}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "cambios_sin_commit": None}
+
+def comparar_con(previo_path: str, actual: dict):
+    with open(previo_path, "r", encoding="utf-8") as f:
+        previo = json.load(f)
+    por_escala = {r["escala"]: r for r in previo.get("resultados", [])}
+    print(f"🆚 Frente a {previo_path} (commit {(previo.get('commit') or '?')[:10]}):")
+    for res in actual["resultados"]:
+        antes = por_escala.get(res["escala"])
+        if not antes:
+            continue
+        for etapa in ETAPAS:
+            t_antes = antes["etapas"].get(etapa, {}).get("segundos")
+            t_ahora = res["etapas"][etapa]["segundos"]
+            if t_antes:
+                print(f"   {res['escala']}x {etapa}: {t_antes:.2f}s → {t_ahora:.2f}s (x{t_antes / max(t_ahora, 1e-9):.2f})")
+
+def suite(args):
+    corpus = cargar_corpus(args.old, args.new, args.comparativas)
+    if not corpus:
+        print(f"❗ No hay corpus: ni asignaturas comunes entre {args.old} y {args.new} ni comparativas en "
+              f"{args.comparativas}")
+        return
+    muestra = random.Random(args.semilla).sample(corpus, min(args.asignaturas, len(corpus)))
+    tasas = {"anio": args.tasa_anio, "editorial": args.tasa_editorial, "orden": args.tasa_orden}
+    informe = {**_commit_actual(),
+               "fecha": datetime.now().isoformat(timespec="seconds"),
+               "python": platform.python_version(),
+               "parametros": {"asignaturas": len(muestra), "escalas": args.escalas, "tasas": tasas,
+                              "semilla": args.semilla, "workers": args.workers, "memoria": not args.sin_memoria},
+               "resultados": []}
+    for escala in args.escalas:
+        res = medir_escala(muestra, escala, tasas, args.semilla + escala, args.workers, not args.sin_memoria)
+        informe["resultados"].append(res)
+        resumen = " | ".join(f"{e}={res['etapas'][e]['segundos']:.2f}s" for e in ETAPAS)
+        print(f"📊 {escala}x ({res['asignaturas']} asignaturas, {res['recursos']} recursos): {resumen}")
+
+    salida = args.salida or os.path.join(
+        BENCH_DIR, f"comparar_{(informe['commit'] or 'sin-git')[:10]}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(salida) or ".", exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=1)
+    print(f"💾 Resultados en {salida}")
+    if args.comparar_con:
+        comparar_con(args.comparar_con, informe)
+
+# ====== Modo índice: recorrido lineal vs índice de candidatos ======
+def medir(asignaturas, usar_indice: bool) -> tuple[float, dict]:
+    resultados = {}
+    _limpiar_caches()
+    t0 = time.perf_counter()
+    for codigo, rec_old, rec_new in asignaturas:
+        resultados[codigo] = comparar.comparar_sets(rec_old, rec_new, usar_indice=usar_indice)
+    return time.perf_counter() - t0, resultados
+
+def modo_indice(args):
+    por_grado = defaultdict(list)
+    for codigo, _, nombre_grado, rec_old, rec_new in cargar_corpus(args.old, args.new, args.comparativas):
+        por_grado[nombre_grado].append((codigo, rec_old, rec_new))
+    if not por_grado:
+        print(f"❗ No hay asignaturas con código común entre {args.old} y {args.new}")
+        return
+
+    def tamano(asignaturas):
+        return sum(len(a) * len(b) for _, a, b in asignaturas)
+
+    grandes = sorted(por_grado.items(), key=lambda kv: -tamano(kv[1]))[:args.grados]
+
+    total_lineal = total_indice = 0.0
+    for nombre_grado, asignaturas in grandes:
+        t_lineal, res_lineal = medir(asignaturas, usar_indice=False)
+        t_indice, res_indice = medir(asignaturas, usar_indice=True)
+        total_lineal += t_lineal
+        total_indice += t_indice
+        iguales = "✔" if res_lineal == res_indice else "❗ DIFERENTE"
+        print(f"{nombre_grado} ({len(asignaturas)} asignaturas): lineal={t_lineal:.2f}s | "
+              f"índice={t_indice:.2f}s | x{t_lineal / max(t_indice, 1e-9):.1f} | {iguales}")
+
+    print(f"📊 Total: lineal={total_lineal:.2f}s | índice={total_indice:.2f}s | "
+          f"x{total_lineal / max(total_indice, 1e-9):.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de comparar.py")
+    parser.add_argument("--modo", choices=("suite", "indice"), default="suite",
+                        help="suite: etapas a varias escalas; indice: recorrido lineal vs índice de candidatos")
+    parser.add_argument("--old", default=comparar.BASE_OLD, help="Carpeta del curso anterior")
+    parser.add_argument("--new", default=comparar.BASE_NEW, help="Carpeta del curso actual")
+    parser.add_argument("--comparativas", default=comparar.COMPARATIVAS_BASE,
+                        help="Comparativas de las que reconstruir el corpus si no existen las carpetas de curso")
+    parser.add_argument("--grados", type=int, default=5, help="[indice] Número de grados (los de más recursos)")
+    parser.add_argument("--asignaturas", type=int, default=100, help="[suite] Asignaturas reales de la muestra (1x)")
+    parser.add_argument("--escalas", type=lambda s: [int(x) for x in s.split(",")], default=[1, 10, 100],
+                        help="[suite] Factores de escala separados por comas")
+    parser.add_argument("--tasa-anio", type=float, default=0.10, help="[suite] Probabilidad de subir un año")
+    parser.add_argument("--tasa-editorial", type=float, default=0.05, help="[suite] Probabilidad de cambiar editorial")
+    parser.add_argument("--tasa-orden", type=float, default=0.05, help="[suite] Probabilidad de reordenar fragmentos")
+    parser.add_argument("--semilla", type=int, default=2025, help="[suite] Semilla de la muestra y las ediciones")
+    parser.add_argument("--workers", type=int, default=comparar.MAX_WORKERS, help="[suite] Procesos del main")
+    parser.add_argument("--sin-memoria", action="store_true", help="[suite] No medir el pico de memoria")
+    parser.add_argument("--salida", help=f"[suite] JSON de resultados (por defecto {BENCH_DIR}/comparar_<commit>_<fecha>.json)")
+    parser.add_argument("--comparar-con", help="[suite] JSON de una ejecución anterior con el que comparar tiempos")
+    args = parser.parse_args()
+
+    if args.modo == "indice":
+        modo_indice(args)
+    else:
+        suite(args)
+
+if __name__ == "__main__":
+    main()
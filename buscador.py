@@ -0,0 +1,190 @@
+""" Búsqueda de texto completo en las bibliografías (cursos) y en las Comparativas.
+
+Cada .txt de las carpetas de BibliografiasUGR/grados (un curso por carpeta, más Comparativas) es un documento de una
+tabla SQLite FTS5 (asignatura, grado y texto, sin distinguir acentos) en BibliografiasUGR/grados/busqueda.sqlite.
+La actualización es incremental: se guarda el mtime y el tamaño de cada archivo y solo se reindexan los que han
+cambiado (y se borran los que ya no existen), así que es barato llamarla al final de cada extracción o de comparar.py.
+app.py la usa para el buscador ("¿qué asignaturas citan a tal autor o libro?").
+
+Uso: python buscador.py                     (actualiza el índice)
+     python buscador.py --buscar "Tanenbaum redes"
+     python buscador.py --reconstruir       (borra el índice y lo vuelve a crear)
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import time
+
+from indice_carpetas import escanear_carpeta
+
+BASE_DIR = os.path.join("BibliografiasUGR", "grados")
+BUSQUEDA_PATH = os.path.join(BASE_DIR, "busqueda.sqlite")
+
+# Marcas del fragmento resaltado: caracteres de control que no aparecen en los .txt, para poder escapar el HTML después
+MARCA_INICIO = "\x02"
+MARCA_FIN = "\x03"
+LIMITE_BUSQUEDA = 20
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    id INTEGER PRIMARY KEY,
+    ruta TEXT UNIQUE NOT NULL,
+    fuente TEXT NOT NULL,
+    carpeta TEXT NOT NULL,
+    archivo TEXT NOT NULL,
+    codigo TEXT,
+    asignatura TEXT,
+    grado TEXT,
+    mtime_ns INTEGER,
+    size INTEGER
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS textos USING fts5(
+    asignatura, grado, texto, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+def conectar(ruta_db: str = BUSQUEDA_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(ruta_db) or ".", exist_ok=True)
+    con = sqlite3.connect(ruta_db, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")  # las búsquedas siguen leyendo mientras se actualiza
+    con.executescript(ESQUEMA)
+    return con
+
+# ====== Actualización incremental ======
+def fuentes_disponibles() -> list[str]:
+    """ Carpetas de curso y de Comparativas que hay ahora mismo en BASE_DIR. """
+    if not os.path.isdir(BASE_DIR):
+        return []
+    with os.scandir(BASE_DIR) as it:
+        return sorted(os.path.join(BASE_DIR, e.name) for e in it if e.is_dir())
+
+def _nombre_legible(nombre: str) -> str:
+    nombre = re.sub(r"^gu[ií]a[_ ]docente[_ ]*", "", nombre, flags=re.IGNORECASE)
+    return " ".join(nombre.replace("_", " ").split())
+
+def actualizar_indice(fuentes: list[str] | None = None, ruta_db: str = BUSQUEDA_PATH) -> dict:
+    """ Sincroniza el índice con los .txt de `fuentes` (por defecto, todas las carpetas de BASE_DIR). Devuelve cuántos
+    documentos se han añadido, actualizado, borrado y dejado igual. """
+    completo = fuentes is None
+    fuentes = [os.path.normpath(f) for f in (fuentes_disponibles() if completo else fuentes)]
+    t0 = time.perf_counter()
+    con = conectar(ruta_db)
+    previos = {ruta: (id_, mtime, size) for id_, ruta, mtime, size
+               in con.execute("SELECT id, ruta, mtime_ns, size FROM documentos")}
+    cuentas = {"nuevos": 0, "actualizados": 0, "borrados": 0, "sin_cambios": 0}
+    vistos = set()
+    with con:
+        for raiz in fuentes:
+            fuente = os.path.basename(os.path.normpath(raiz))
+            for carpeta, info in escanear_carpeta(raiz).items():
+                for archivo, nombre_asig, codigo in info["archivos"]:
+                    ruta = os.path.join(raiz, carpeta, archivo)
+                    try:
+                        st = os.stat(ruta)
+                    except OSError:
+                        continue
+                    vistos.add(ruta)
+                    previo = previos.get(ruta)
+                    if previo and previo[1] == st.st_mtime_ns and previo[2] == st.st_size:
+                        cuentas["sin_cambios"] += 1
+                        continue
+                    with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+                        texto = f.read()
+                    asignatura = _nombre_legible(nombre_asig)
+                    if previo:
+                        con.execute("DELETE FROM textos WHERE rowid = ?", (previo[0],))
+                        con.execute("UPDATE documentos SET mtime_ns = ?, size = ?, asignatura = ?, grado = ?, codigo = ? "
+                                    "WHERE id = ?", (st.st_mtime_ns, st.st_size, asignatura, info["grado_nombre"],
+                                                     codigo, previo[0]))
+                        id_ = previo[0]
+                        cuentas["actualizados"] += 1
+                    else:
+                        id_ = con.execute(
+                            "INSERT INTO documentos (ruta, fuente, carpeta, archivo, codigo, asignatura, grado, mtime_ns, "
+                            "size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (ruta, fuente, carpeta, archivo, codigo, asignatura, info["grado_nombre"],
+                             st.st_mtime_ns, st.st_size)).lastrowid
+                        cuentas["nuevos"] += 1
+                    con.execute("INSERT INTO textos (rowid, asignatura, grado, texto) VALUES (?, ?, ?, ?)",
+                                (id_, asignatura, info["grado_nombre"], texto))
+        # Si se ha pedido una sola carpeta, solo se borran documentos de esa carpeta
+        raices = tuple(os.path.join(r, "") for r in fuentes)
+        for ruta, (id_, _, _) in previos.items():
+            if ruta not in vistos and (completo or ruta.startswith(raices)):
+                con.execute("DELETE FROM textos WHERE rowid = ?", (id_,))
+                con.execute("DELETE FROM documentos WHERE id = ?", (id_,))
+                cuentas["borrados"] += 1
+    con.close()
+    cuentas["segundos"] = round(time.perf_counter() - t0, 3)
+    return cuentas
+
+# ====== Búsqueda ======
+def consulta_fts(texto: str) -> str:
+    """ Convierte lo que escribe el usuario en una consulta FTS5 segura: todas las palabras (entre comillas, sin
+    operadores) y la última como prefijo, para que "tanenb" ya encuentre "Tanenbaum". """
+    palabras = TOKEN_RE.findall(texto or "")
+    if not palabras:
+        return ""
+    partes = [f'"{p}"' for p in palabras]
+    if len(palabras[-1]) >= 3:
+        partes[-1] += "*"
+    return " ".join(partes)
+
+def buscar(texto: str, limite: int = LIMITE_BUSQUEDA, fuente: str | None = None,
+           ruta_db: str = BUSQUEDA_PATH) -> list[dict]:
+    """ Asignaturas que contienen todas las palabras de `texto`, de más a menos relevante (bm25, con más peso para el
+    nombre de la asignatura y del grado), con un fragmento del texto en el que las coincidencias van entre
+    MARCA_INICIO y MARCA_FIN. """
+    consulta = consulta_fts(texto)
+    if not consulta or not os.path.exists(ruta_db):
+        return []
+    sql = ("SELECT d.fuente, d.carpeta, d.archivo, d.codigo, d.asignatura, d.grado, "
+           f"snippet(textos, 2, '{MARCA_INICIO}', '{MARCA_FIN}', '…', 16), bm25(textos, 5.0, 2.0, 1.0) AS rango "
+           "FROM textos JOIN documentos d ON d.id = textos.rowid WHERE textos MATCH ?")
+    parametros = [consulta]
+    if fuente:
+        sql += " AND d.fuente = ?"
+        parametros.append(fuente)
+    sql += " ORDER BY rango LIMIT ?"
+    parametros.append(limite)
+    con = sqlite3.connect(ruta_db, timeout=30)
+    try:
+        filas = con.execute(sql, parametros).fetchall()
+    finally:
+        con.close()
+    return [{"fuente": f, "carpeta": c, "archivo": a, "codigo": cod, "asignatura": asig, "grado": g,
+             "fragmento": frag, "puntuacion": round(-rango, 3)}
+            for f, c, a, cod, asig, g, frag, rango in filas]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Índice de búsqueda (SQLite FTS5) de bibliografías y comparativas")
+    parser.add_argument("--buscar", metavar="TEXTO", help="Busca TEXTO en el índice (tras actualizarlo)")
+    parser.add_argument("--fuente", help="Limita la búsqueda a una fuente (2024-2025, 2025-2026, Comparativas)")
+    parser.add_argument("--limite", type=int, default=LIMITE_BUSQUEDA, help="Número máximo de resultados")
+    parser.add_argument("--reconstruir", action="store_true", help="Borra el índice y lo crea de cero")
+    parser.add_argument("--db", default=BUSQUEDA_PATH, help="Ruta del índice SQLite")
+    args = parser.parse_args(argv)
+
+    if args.reconstruir:
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + sufijo):
+                os.remove(args.db + sufijo)
+
+    print("🔎 Actualizando índice de búsqueda…")
+    cuentas = actualizar_indice(ruta_db=args.db)
+    print(f" → {cuentas['nuevos']} nuevos, {cuentas['actualizados']} actualizados, {cuentas['borrados']} borrados, "
+          f"{cuentas['sin_cambios']} sin cambios ({cuentas['segundos']} s)")
+
+    if args.buscar:
+        resultados = buscar(args.buscar, args.limite, args.fuente, ruta_db=args.db)
+        print(f"📚 {len(resultados)} resultado(s) para «{args.buscar}»:")
+        for r in resultados:
+            fragmento = r["fragmento"].replace(MARCA_INICIO, "«").replace(MARCA_FIN, "»").replace("\n", " ")
+            print(f"   [{r['fuente']}] {r['asignatura']} ({r['codigo']}) · {r['grado']}")
+            print(f"      {fragmento}")
+
+if __name__ == "__main__":
+    main()
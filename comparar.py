@@ -7,12 +7,25 @@ todas, aunque en realidad no tendría porque ser así).
 
 import os
 import re
+import json
+import math
+import hashlib
+import argparse
 import unicodedata
+from collections import Counter, defaultdict
 from datetime import datetime
 from difflib import SequenceMatcher
-import textwrap
+from functools import lru_cache
+from typing import NamedTuple
+import time
+import cProfile
+from contextlib import contextmanager
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
+from indice_carpetas import split_name_and_code_from_filename, split_degree_name_and_code_from_folder, \
+    index_year_folder
+from justificado import JUSTIFY_WIDTH, format_entry
+
 """ Este fragmento de código indica DÓNDE se guardarán los archivos que muestren las diferencias entre las guías del 
 año actual y las del año pasado (eliminadas, añadidas, sin cambios), actualmente se está indicando que las comparativas 
 se guarden en BibliografiasUGR/grados/Comparativas y dentro se guardarán los directorios de los grados.
@@ -23,13 +36,35 @@ BASE_DIR = os.path.join("BibliografiasUGR", "grados")
 BASE_OLD = os.path.join(BASE_DIR, "2024-2025")
 BASE_NEW = os.path.join(BASE_DIR, "2025-2026")
 COMPARATIVAS_BASE = os.path.join(BASE_DIR, "Comparativas")
-os.makedirs(COMPARATIVAS_BASE, exist_ok=True)
+
+""" El manifiesto guarda, por código de asignatura, el hash de los dos .txt de entrada, la versión del algoritmo y la
+ruta de la comparativa generada. Así solo se recalculan las asignaturas cuyas guías han cambiado (o todas si cambia
+MATCHER_VERSION) y se borran las comparativas de códigos que ya no existen. Hay que incrementar MATCHER_VERSION cada vez
+que se modifique el emparejamiento o el formato de salida."""
+MANIFIESTO_PATH = os.path.join(COMPARATIVAS_BASE, "manifiesto_comparativas.json")
+MATCHER_VERSION = 6
+
+""" Junto a cada comparativa .txt se escribe un .json con los mismos datos en formato máquina, y en cada carpeta de grado
+un INDICE_GRADO con una línea por asignatura (contadores, porcentaje, hashes y fechas) para que app.py y otras
+herramientas no tengan que volver a parsear el texto. Ambos llevan el mtime y el tamaño del .txt del que salieron: si
+una ejecución se corta entre el .txt y su .json (o el índice), quien los lea ve que no coinciden y parsea el .txt."""
+INDICE_GRADO = "indice_grado.json"
 
 # Esta línea de código configura el paralelismo del código para poder acelerar el proceso de extraer las comparativas
 MAX_WORKERS = max(2, (os.cpu_count() or 4) - 1)  # ajusta a tu máquina
+# Máximo de asignaturas por lote enviado a cada proceso (los grados se agrupan enteros mientras quepan)
+TAM_LOTE = 64
+
+# Las comparativas se guardan sin justificar (un recurso por párrafo); app.py justifica al mostrar si se le pide.
+# Con True se vuelve al formato antiguo justificado a JUSTIFY_WIDTH columnas
+JUSTIFICAR_SALIDA = False
 
-# Indica el ancho del justificado
-JUSTIFY_WIDTH = 100
+# Tamaño de la caché LRU de recursos normalizados (un mismo libro aparece en muchas asignaturas); 0 la desactiva
+NORM_CACHE_SIZE = 50_000
+# Límites del catálogo de referencias de cada proceso (ver "Catálogo de referencias"); al superarlos se vacía
+CATALOGO_MAX_TEXTOS = 1_000_000
+CATALOGO_MAX_PARES = 2_000_000
+CATALOGO_MAX_ASIGNATURAS = 20_000
 
 # ====== Normalización / utilidades ======
 PUNCT_END = r"[.;:,·•]+$"
@@ -38,6 +73,12 @@ PUBLISHERS_CITIES = (
     "garceta|sanz|torres|pearson|mcgraw|hill|anaya|oxford|elsevier|"
     "granada|madrid|barcelona|sevilla|valencia"
 )
+PUBLISHERS_RE = re.compile(fr"\b({PUBLISHERS_CITIES})\b")
+YEAR_RE = re.compile(r"\b(1[89]\d{2}|20\d{2}|21\d{2})\b")
+URL_RE = re.compile(r"https?://\S+")
+EDITION_NUM_RE = re.compile(r"\b\d{1,2}\s*(?:ª|a|\.ª)?\s*(?:ed\.?|edicion|edición)\b", re.IGNORECASE)
+EDITION_WORD_RE = re.compile(r"\b(?:segunda|tercera|cuarta|quinta)\s+(?:edicion|edición)\b", re.IGNORECASE)
+NON_ALNUM_RE = re.compile(r"[^a-z0-9\s]")
 GUIDE_HEADER_RE = re.compile(r"^\s*gu[ií]a docente\b", re.IGNORECASE)
 
 def _norm(s: str) -> str:
@@ -70,46 +111,52 @@ def normalizar_nombre(texto: str) -> str:
     return ''.join(c for c in unicodedata.normalize('NFD', texto.lower()) if unicodedata.category(c) != 'Mn')
 
 def remove_urls_years_editions_raw(s: str) -> str:
-    s = re.sub(r"https?://\S+", " ", s)
-    s = re.sub(r"\b(1[89]\d{2}|20\d{2}|21\d{2})\b", " ", s)
-    s = re.sub(r"\b\d{1,2}\s*(?:ª|a|\.ª)?\s*(?:ed\.?|edicion|edición)\b", " ", s, flags=re.IGNORECASE)
-    s = re.sub(r"\b(?:segunda|tercera|cuarta|quinta)\s+(?:edicion|edición)\b", " ", s, flags=re.IGNORECASE)
+    s = URL_RE.sub(" ", s)
+    s = YEAR_RE.sub(" ", s)
+    s = EDITION_NUM_RE.sub(" ", s)
+    s = EDITION_WORD_RE.sub(" ", s)
     return s
 
-def normalize_for_match(s: str) -> str:
-    s = strip_bullets_and_punct(s)
-    s = normalizar_nombre(s)
-    s = remove_urls_years_editions_raw(s)
-    s = re.sub(fr"\b({PUBLISHERS_CITIES})\b", " ", s)
-    s = re.sub(r"[^a-z0-9\s]", " ", s)
-    s = re.sub(r"\s{2,}", " ", s).strip()
-    tokens = s.split(); tokens.sort()
+def _base_normalizada(s: str) -> str:
+    return remove_urls_years_editions_raw(normalizar_nombre(strip_bullets_and_punct(s)))
+
+def _tokens_ordenados(s: str) -> str:
+    tokens = NON_ALNUM_RE.sub(" ", s).split(); tokens.sort()
     return " ".join(tokens)
 
+def normalize_for_match(s: str) -> str:
+    return _tokens_ordenados(PUBLISHERS_RE.sub(" ", _base_normalizada(s)))
+
 def normalize_without_years_editions(s: str) -> str:
-    s = strip_bullets_and_punct(s)
-    s = normalizar_nombre(s)
-    s = remove_urls_years_editions_raw(s)
-    s = re.sub(r"[^a-z0-9\s]", " ", s)
-    s = re.sub(r"\s{2,}", " ", s).strip()
-    tokens = s.split(); tokens.sort()
-    return " ".join(tokens)
+    return _tokens_ordenados(_base_normalizada(s))
 
 def normalize_without_publishers(s: str) -> str:
-    s = strip_bullets_and_punct(s)
-    s = normalizar_nombre(s)
-    s = remove_urls_years_editions_raw(s)
-    s = re.sub(fr"\b({PUBLISHERS_CITIES})\b", " ", s)
-    s = re.sub(r"[^a-z0-9\s]", " ", s)
-    s = re.sub(r"\s{2,}", " ", s).strip()
-    tokens = s.split(); tokens.sort()
-    return " ".join(tokens)
+    return _tokens_ordenados(PUBLISHERS_RE.sub(" ", _base_normalizada(s)))
 
 def years_anywhere(s: str) -> set[str]:
-    return set(re.findall(r"\b(1[89]\d{2}|20\d{2}|21\d{2})\b", s))
+    return set(YEAR_RE.findall(s))
+
+# ====== Registro normalizado por recurso ======
+""" Todas las formas normalizadas de un recurso se calculan UNA vez y las reutilizan todas las etapas de comparar_sets
+(emparejamiento, índice, núcleo sin años, cobertura de tokens y años). Hoy normalize_without_publishers aplica las
+mismas reglas que normalize_for_match, así que ambos campos comparten la misma cadena."""
+class RecursoNormalizado(NamedTuple):
+    match: str               # normalize_for_match
+    sin_editoriales: str     # normalize_without_publishers
+    sin_anios: str           # normalize_without_years_editions
+    tokens: frozenset        # tokens de sin_editoriales (los de token_coverage_equal)
+    anios: frozenset         # years_anywhere sobre el texto original
+
+def _construir_registro(s: str) -> RecursoNormalizado:
+    base = _base_normalizada(s)
+    sin_anios = _tokens_ordenados(base)
+    match = _tokens_ordenados(PUBLISHERS_RE.sub(" ", base))
+    return RecursoNormalizado(match, match, sin_anios, frozenset(match.split()), frozenset(YEAR_RE.findall(s)))
+
+normalizar_recurso = lru_cache(maxsize=NORM_CACHE_SIZE)(_construir_registro) if NORM_CACHE_SIZE else _construir_registro
 
 def has_year(s: str) -> bool:
-    return bool(years_anywhere(s))
+    return bool(normalizar_recurso(s).anios)
 
 def pick_longer_with_year(a: str, b: str) -> str:
     ay, by = has_year(a), has_year(b)
@@ -125,9 +172,9 @@ def tokens(s: str) -> set:
     return set(s.split())
 
 def token_coverage_equal(a: str, b: str, threshold: float = 0.9) -> bool:
-    a_norm = normalize_without_publishers(a)
-    b_norm = normalize_without_publishers(b)
-    ta, tb = tokens(a_norm), tokens(b_norm)
+    return cobertura_tokens(normalizar_recurso(a).tokens, normalizar_recurso(b).tokens, threshold)
+
+def cobertura_tokens(ta: frozenset, tb: frozenset, threshold: float = 0.9) -> bool:
     if not ta or not tb:
         return False
     short, long_ = (ta, tb) if len(ta) <= len(tb) else (tb, ta)
@@ -137,14 +184,435 @@ def token_coverage_equal(a: str, b: str, threshold: float = 0.9) -> bool:
 
 def best_match(item: str, candidates: set, threshold: float = 0.86):
     best_cand, best_score = None, 0.0
-    a = normalize_for_match(item)
+    a = normalizar_recurso(item).match
     for cand in candidates:
-        b = normalize_for_match(cand)
+        b = normalizar_recurso(cand).match
         score = SequenceMatcher(None, a, b).ratio()
         if score > best_score:
             best_score, best_cand = score, cand
     return (best_cand, best_score) if best_score >= threshold else (None, 0.0)
 
+# ====== Registro bibliográfico estructurado (identificadores, autor y título) ======
+""" Muchos recursos llevan un ISBN, un DOI o una URL que identifican la obra sin ambigüedad, y casi todos siguen el
+esquema "Apellido, N. (año). Título. Editorial". parsear_referencia extrae de cada recurso un registro compacto con esos
+datos y emparejar hace primero uniones exactas por diccionario (identificadores y luego autor+título); solo lo que no se
+une así pasa al emparejamiento difuso. El ISSN se guarda pero no se usa para unir: identifica la revista, no el
+artículo, y dos artículos de la misma revista comparten ISSN."""
+ISBN_RE = re.compile(r"\bISBN(?:-1[03])?\s*:?\s*([0-9Xx][0-9Xx\s-]{8,20})", re.IGNORECASE)
+ISBN13_SUELTO_RE = re.compile(r"\b97[89](?:[\s-]?\d){10}\b")
+ISSN_RE = re.compile(r"\bISSN\s*:?\s*(\d{4}-?\d{3}[\dXx])\b", re.IGNORECASE)
+DOI_RE = re.compile(r"\b(10\.\d{4,9}/[^\s\"<>]+)", re.IGNORECASE)
+ANIO_PARENTESIS_RE = re.compile(r"\(\s*(?:1[89]\d{2}|20\d{2}|21\d{2})[a-z]?\s*\)\s*[.:,]?\s*")
+PARENTESIS_RE = re.compile(r"\([^()]*\)")
+FIN_TITULO_RE = re.compile(r"\.(?:\s|$)")
+AUTOR_FIN_RE = re.compile(r"[,(.;:]")
+IDENT_FIN = ".,;:)]}»\"'"
+MIN_TOKENS_TITULO = 3
+COBERTURA_IDENT = 0.6
+
+class RegistroBibliografico(NamedTuple):
+    identificadores: frozenset  # "isbn:978...", "doi:10...", "url:host/ruta" (los que sirven para unir)
+    issn: frozenset
+    anios: frozenset
+    autor: str                  # apellido(s) del primer autor, sin acentos ni signos
+    titulo: str                 # núcleo del título, sin acentos ni signos, en su orden original
+    clave: str | None           # autor|titulo si ambos son fiables, None si no
+
+def _isbn13_valido(d: str) -> bool:
+    return len(d) == 13 and d.isdigit() and sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(d)) % 10 == 0
+
+def _isbn10_valido(d: str) -> bool:
+    if len(d) != 10 or not d[:9].isdigit() or not (d[9].isdigit() or d[9] in "Xx"):
+        return False
+    valores = [int(c) for c in d[:9]] + [10 if d[9] in "Xx" else int(d[9])]
+    return sum((10 - i) * v for i, v in enumerate(valores)) % 11 == 0
+
+def normalizar_isbn(texto: str) -> str | None:
+    """ ISBN-13 canónico (los ISBN-10 se convierten) o None si no hay un ISBN válido al principio de texto. """
+    d = re.sub(r"[\s-]", "", texto).upper()
+    if _isbn13_valido(d[:13]):
+        return d[:13]
+    if _isbn10_valido(d[:10]):
+        base = "978" + d[:9]
+        control = (10 - sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(base)) % 10) % 10
+        return base + str(control)
+    return None
+
+def normalizar_url(url: str) -> str | None:
+    u = url.rstrip(IDENT_FIN).lower()
+    u = re.sub(r"^https?://(?:www\.)?", "", u).rstrip("/")
+    host, _, camino = u.partition("/")
+    # Una URL sin ruta (la portada de una web) no identifica ninguna obra concreta
+    return u if host and camino else None
+
+def _parsear_autor(s: str) -> str:
+    fin = AUTOR_FIN_RE.search(s)
+    if not fin or fin.start() == 0:
+        return ""
+    autor = NON_ALNUM_RE.sub(" ", normalizar_nombre(s[:fin.start()])).split()
+    if not autor or len(autor) > 4 or any(t.isdigit() for t in autor):
+        return ""
+    return " ".join(autor)
+
+def _parsear_titulo(s: str) -> str:
+    anio = ANIO_PARENTESIS_RE.search(s)
+    if not anio:
+        return ""
+    resto = PARENTESIS_RE.sub(" ", URL_RE.sub(" ", s[anio.end():]))
+    fin = FIN_TITULO_RE.search(resto)
+    titulo = resto[:fin.start()] if fin else resto
+    return " ".join(NON_ALNUM_RE.sub(" ", normalizar_nombre(titulo)).split())
+
+def _construir_referencia(s: str) -> RegistroBibliografico:
+    s = strip_bullets_and_punct(s)
+    ids = set()
+    for m in ISBN_RE.finditer(s):
+        isbn = normalizar_isbn(m.group(1))
+        if isbn:
+            ids.add("isbn:" + isbn)
+    for m in ISBN13_SUELTO_RE.finditer(s):
+        isbn = normalizar_isbn(m.group(0))
+        if isbn:
+            ids.add("isbn:" + isbn)
+    for m in DOI_RE.finditer(s):
+        ids.add("doi:" + m.group(1).rstrip(IDENT_FIN).lower())
+    for m in URL_RE.finditer(s):
+        url = normalizar_url(m.group(0))
+        if url:
+            ids.add("url:" + url)
+    issn = frozenset(m.group(1).replace("-", "").upper() for m in ISSN_RE.finditer(s))
+    autor = _parsear_autor(s)
+    titulo = _parsear_titulo(s)
+    clave = f"{autor}|{titulo}" if autor and len(titulo.split()) >= MIN_TOKENS_TITULO else None
+    return RegistroBibliografico(frozenset(ids), issn, frozenset(YEAR_RE.findall(s)), autor, titulo, clave)
+
+parsear_referencia = lru_cache(maxsize=NORM_CACHE_SIZE)(_construir_referencia) if NORM_CACHE_SIZE else _construir_referencia
+
+def _ident_compatible(a: str, b: str) -> bool:
+    """ Evita unir por un DOI o una URL que aparece dentro de una entrada con varias referencias pegadas: el texto de
+    ambos recursos (sin identificadores) tiene que solaparse. Un recurso que es solo el identificador siempre vale. """
+    ta, tb = normalizar_recurso(a).tokens, normalizar_recurso(b).tokens
+    return not ta or not tb or cobertura_tokens(ta, tb, threshold=COBERTURA_IDENT)
+
+def unir_por_claves(antiguos: list[str], candidatos: list[str]) -> dict[str, str]:
+    """ Uniones exactas antiguo -> nuevo: primero por identificador (doi, isbn, url, en ese orden; ver _ident_compatible)
+    y, si no hay, por la clave autor+título. Ante varias coincidencias gana el primer candidato en el orden de candidatos. """
+    por_id, por_clave = {}, {}
+    for c in candidatos:
+        ref = parsear_referencia(c)
+        for ident in ref.identificadores:
+            por_id.setdefault(ident, c)
+        if ref.clave:
+            por_clave.setdefault(ref.clave, c)
+    unidos = {}
+    if not por_id and not por_clave:
+        return unidos
+    for r24 in antiguos:
+        ref = parsear_referencia(r24)
+        cand = next((por_id[i] for i in sorted(ref.identificadores) if i in por_id and _ident_compatible(r24, por_id[i])),
+                    None)
+        if cand is None and ref.clave:
+            cand = por_clave.get(ref.clave)
+        if cand is not None:
+            unidos[r24] = cand
+    return unidos
+
+# ====== Métricas por fase ======
+""" Cada proceso acumula por fase (indexado, lectura, exacto, difuso, clasificacion, escritura...) el tiempo de reloj,
+el tiempo de CPU, las llamadas y los elementos procesados. worker_compare_batch devuelve lo acumulado en cada lote y
+main lo agrega por worker y en total, y lo guarda en Resumen_<marca>.json junto a las asignaturas más lentas.
+Dentro de fases_suspendidas() no se registra nada: el informe de motores vuelve a emparejar cada asignatura dos veces
+y se mide entero como "informe_motores", sin sumar sus exacto/difuso a los del recorrido principal."""
+N_MAS_LENTAS = 20
+_fases: dict[str, dict] = {}
+_fases_activas = True
+
+@contextmanager
+def fases_suspendidas():
+    global _fases_activas
+    previo, _fases_activas = _fases_activas, False
+    try:
+        yield
+    finally:
+        _fases_activas = previo
+
+@contextmanager
+def fase(nombre: str, elementos: int = 0):
+    if not _fases_activas:
+        yield
+        return
+    t0, c0 = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        m = _fases.setdefault(nombre, {"segundos": 0.0, "cpu": 0.0, "llamadas": 0, "elementos": 0})
+        m["segundos"] += time.perf_counter() - t0
+        m["cpu"] += time.process_time() - c0
+        m["llamadas"] += 1
+        m["elementos"] += elementos
+
+def extraer_fases() -> dict[str, dict]:
+    """ Devuelve lo acumulado desde la última llamada y pone los contadores a cero. """
+    fases = {nombre: dict(m) for nombre, m in _fases.items()}
+    _fases.clear()
+    return fases
+
+def sumar_fases(destino: dict[str, dict], origen: dict[str, dict]):
+    for nombre, m in origen.items():
+        d = destino.setdefault(nombre, {"segundos": 0.0, "cpu": 0.0, "llamadas": 0, "elementos": 0})
+        for clave, valor in m.items():
+            d[clave] += valor
+
+def redondear_fases(fases: dict[str, dict]) -> dict[str, dict]:
+    return {nombre: {k: round(v, 4) if isinstance(v, float) else v for k, v in m.items()}
+            for nombre, m in sorted(fases.items())}
+
+# ====== Catálogo de referencias del proceso ======
+""" Un mismo manual aparece en decenas de asignaturas y en los dobles grados se repiten bibliografías enteras. Cada
+proceso mantiene un catálogo que asigna un entero a cada texto (recurso o forma normalizada) distinto, guarda los ratios
+ya calculados por pareja de enteros y memoriza el resultado de comparar_sets por pareja de bibliografías vistas como
+tuplas de enteros. Así el trabajo repetido de toda la universidad se hace una vez por pareja distinta en cada worker.
+Los ratios guardados son exactamente los que daría SequenceMatcher, así que las decisiones no cambian. Los tres
+diccionarios están acotados (CATALOGO_MAX_*); el de textos solo se vacía al empezar comparar_sets, junto con los otros
+dos, porque reasignar ids a mitad de una comparación mezclaría claves viejas y nuevas."""
+_catalogo: dict[str, int] = {}
+_ratios_catalogo: dict[tuple[int, int], float] = {}
+_comparaciones_catalogo: dict[tuple, tuple] = {}
+
+def id_catalogo(texto: str) -> int:
+    id_ = _catalogo.get(texto)
+    if id_ is None:
+        id_ = _catalogo[texto] = len(_catalogo)
+    return id_
+
+def ids_catalogo(recursos) -> tuple[int, ...]:
+    return tuple(sorted(id_catalogo(r) for r in recursos))
+
+def ratio_catalogado(a: str, b: str, sm: SequenceMatcher | None = None) -> float:
+    """ ratio(a, b) cacheado por pareja de ids; sm es un SequenceMatcher ya preparado con (a, b) si se tiene. """
+    clave = (id_catalogo(a), id_catalogo(b))
+    score = _ratios_catalogo.get(clave)
+    if score is None:
+        if len(_ratios_catalogo) >= CATALOGO_MAX_PARES:
+            _ratios_catalogo.clear()
+        score = _ratios_catalogo[clave] = sm.ratio() if sm is not None else ratio(a, b)
+    return score
+
+def vaciar_catalogo():
+    _catalogo.clear()
+    _ratios_catalogo.clear()
+    _comparaciones_catalogo.clear()
+
+def estadisticas_catalogo() -> dict[str, int]:
+    return {"textos": len(_catalogo), "pares": len(_ratios_catalogo), "asignaturas": len(_comparaciones_catalogo)}
+
+# ====== Índice de candidatos (bloqueo por n-gramas y tokens) ======
+""" En lugar de puntuar cada recurso antiguo contra TODOS los nuevos, se construye una vez por asignatura un índice
+invertido de trigramas de caracteres y de tokens sobre los recursos nuevos. Los filtros son "seguros": solo descartan
+candidatos que no pueden alcanzar el umbral (filtro de longitud y lema de q-gramas: si ratio >= t, la distancia de
+inserciones/borrados es k <= (1 - t)·(la + lb) y ambas cadenas comparten al menos max(la, lb) - q + 1 - k·q q-gramas),
+de modo que el resultado es idéntico al del recorrido lineal."""
+NGRAM_Q = 3
+
+def qgramas(s: str, q: int = NGRAM_Q) -> Counter:
+    return Counter(s[i:i + q] for i in range(len(s) - q + 1))
+
+def indice_ngramas(normas: list[str]) -> dict:
+    """ Índice de trigramas sobre `normas` (cadenas ya normalizadas) para best_match_indexado y primer_match_indexado,
+    que devuelven posiciones de esta lista. También lo usa extraer_bibliografia_ugr.py para emparejar títulos. """
+    postings = defaultdict(list)
+    por_longitud = defaultdict(list)
+    for pos, s in enumerate(normas):
+        for g, c in qgramas(s).items():
+            postings[g].append((pos, c))
+        por_longitud[len(s)].append(pos)
+    return {
+        "normas": normas,
+        "longitudes": [len(s) for s in normas],
+        "postings": postings,
+        "por_longitud": por_longitud,
+        "matchers": [None] * len(normas),
+    }
+
+def _indice_tokens(conjuntos: list[frozenset]) -> dict:
+    postings = defaultdict(list)
+    for pos, ts in enumerate(conjuntos):
+        for t in ts:
+            postings[t].append(pos)
+    return {"postings": postings, "tamanos": [len(ts) for ts in conjuntos]}
+
+def construir_indice_candidatos(candidatos: list[str]) -> dict:
+    """ El orden de `candidatos` es el orden de desempate: debe ser el mismo en que se recorrería el set original. """
+    registros = [normalizar_recurso(c) for c in candidatos]
+    normas_match = [r.match for r in registros]
+    normas_pub = [r.sin_editoriales for r in registros]
+    ind_match = indice_ngramas(normas_match)
+    ind_pub = ind_match if normas_pub == normas_match else indice_ngramas(normas_pub)
+    return {
+        "candidatos": candidatos,
+        "match": ind_match,
+        "pub": ind_pub,
+        "tokens": _indice_tokens([r.tokens for r in registros]),
+    }
+
+def _matcher(ind: dict, pos: int) -> SequenceMatcher:
+    # Se reutiliza el análisis de seq2 (el candidato) entre todos los recursos antiguos de la asignatura
+    sm = ind["matchers"][pos]
+    if sm is None:
+        sm = SequenceMatcher(None)
+        sm.set_seq2(ind["normas"][pos])
+        ind["matchers"][pos] = sm
+    return sm
+
+def _candidatos_ngramas(a: str, ind: dict, threshold: float) -> list[int]:
+    la = len(a)
+    compartidos = Counter()
+    for g, c in qgramas(a).items():
+        for pos, cb in ind["postings"].get(g, ()):
+            compartidos[pos] += min(c, cb)
+
+    seleccion = set()
+    minimos = {}
+    for lb, posiciones in ind["por_longitud"].items():
+        total = la + lb
+        if 2 * min(la, lb) < threshold * total - 1e-9:
+            continue  # ni con todos los caracteres emparejados se llegaría al umbral
+        k_max = math.floor((1.0 - threshold) * total + 1e-9)
+        minimo = max(la, lb) - NGRAM_Q + 1 - k_max * NGRAM_Q
+        if minimo <= 0:
+            seleccion.update(posiciones)
+        else:
+            minimos[lb] = minimo
+    longitudes = ind["longitudes"]
+    seleccion.update(p for p, n in compartidos.items() if n >= minimos.get(longitudes[p], math.inf))
+    return sorted(seleccion)
+
+def best_match_indexado(a: str, ind: dict, threshold: float = 0.86):
+    """ Igual que best_match, pero con `a` ya normalizado y devolviendo la posición del candidato en el índice. """
+    best_pos, best_score = None, 0.0
+    for pos in _candidatos_ngramas(a, ind, threshold):
+        score = _ratios_catalogo.get((id_catalogo(a), id_catalogo(ind["normas"][pos])))
+        if score is None:
+            sm = _matcher(ind, pos)
+            sm.set_seq1(a)
+            # real_quick_ratio/quick_ratio son cotas superiores de ratio: si no lo superan, no puede ganar
+            if sm.real_quick_ratio() <= best_score or sm.quick_ratio() <= best_score:
+                continue
+            score = ratio_catalogado(a, ind["normas"][pos], sm)
+        if score > best_score:
+            best_score, best_pos = score, pos
+    return (best_pos, best_score) if best_score >= threshold else (None, 0.0)
+
+def primer_match_indexado(a: str, ind: dict, threshold: float) -> int | None:
+    for pos in _candidatos_ngramas(a, ind, threshold):
+        score = _ratios_catalogo.get((id_catalogo(a), id_catalogo(ind["normas"][pos])))
+        if score is None:
+            sm = _matcher(ind, pos)
+            sm.set_seq1(a)
+            if sm.quick_ratio() < threshold:
+                continue
+            score = ratio_catalogado(a, ind["normas"][pos], sm)
+        if score >= threshold:
+            return pos
+    return None
+
+def primer_cobertura_indexada(ta: frozenset, ind: dict, threshold: float = 0.9) -> int | None:
+    if not ta:
+        return None
+    inter = Counter()
+    for t in ta:
+        for pos in ind["postings"].get(t, ()):
+            inter[pos] += 1
+    tamanos = ind["tamanos"]
+    for pos in sorted(inter):
+        if inter[pos] / max(min(len(ta), tamanos[pos]), 1) >= threshold:
+            return pos
+    return None
+
+# ====== Motor vectorial de trigramas (opcional: numpy + scipy) ======
+""" Alternativa a difflib: cada recurso normalizado de la asignatura (antiguos y nuevos) se representa como un vector
+disperso de trigramas de caracteres y toda la matriz de similitud coseno se obtiene con un único producto disperso.
+Se aplican los mismos umbrales y el mismo orden de etapas que en el motor difflib (0.86 mejor candidato, 0.92 primer
+candidato sin editoriales, 0.9 cobertura de tokens), pero el coseno no es el ratio de SequenceMatcher, así que algunas
+decisiones pueden variar: por eso existe --informe-motores."""
+MOTORES = ("difflib", "ngramas")
+
+def _importar_numpy_scipy():
+    try:
+        import numpy as np
+        from scipy import sparse
+    except ImportError as e:
+        raise RuntimeError("El motor 'ngramas' necesita numpy y scipy (pip install numpy scipy)") from e
+    return np, sparse
+
+def _matrices_dispersas(conteos_a: list[dict], conteos_b: list[dict]):
+    """ Matrices CSR (filas = recursos) de ambos lados sobre un vocabulario común. """
+    np, sparse = _importar_numpy_scipy()
+    vocab = {}
+
+    def _tripletas(filas_conteos):
+        filas, cols, vals = [], [], []
+        for i, conteos in enumerate(filas_conteos):
+            for clave, c in conteos.items():
+                filas.append(i)
+                cols.append(vocab.setdefault(clave, len(vocab)))
+                vals.append(c)
+        return vals, (filas, cols)
+
+    trip_a, trip_b = _tripletas(conteos_a), _tripletas(conteos_b)
+    ancho = max(len(vocab), 1)
+    return (sparse.csr_matrix(trip_a, shape=(len(conteos_a), ancho), dtype=np.float64),
+            sparse.csr_matrix(trip_b, shape=(len(conteos_b), ancho), dtype=np.float64))
+
+def _similitud_coseno(textos_a: list[str], textos_b: list[str]):
+    np, sparse = _importar_numpy_scipy()
+    a, b = _matrices_dispersas([qgramas(t) for t in textos_a], [qgramas(t) for t in textos_b])
+
+    def _normalizar_filas(m):
+        normas = np.sqrt(np.asarray(m.multiply(m).sum(axis=1)).ravel())
+        normas[normas == 0] = 1.0
+        return sparse.diags(1.0 / normas) @ m
+
+    return (_normalizar_filas(a) @ _normalizar_filas(b).T).toarray()
+
+def _cobertura_vectorial(tokens_a: list[frozenset], tokens_b: list[frozenset]):
+    np, _ = _importar_numpy_scipy()
+    a, b = _matrices_dispersas([dict.fromkeys(t, 1) for t in tokens_a], [dict.fromkeys(t, 1) for t in tokens_b])
+    inter = (a @ b.T).toarray()
+    tam_a = np.array([len(t) for t in tokens_a], dtype=np.float64)
+    tam_b = np.array([len(t) for t in tokens_b], dtype=np.float64)
+    cobertura = inter / np.maximum(np.minimum.outer(tam_a, tam_b), 1.0)
+    cobertura[(tam_a == 0)[:, None] | (tam_b == 0)[None, :]] = 0.0
+    return cobertura
+
+def emparejar_ngramas(antiguos: list[str], candidatos: list[str]) -> list[tuple[str, str | None]]:
+    if not antiguos or not candidatos:
+        return [(r, None) for r in antiguos]
+    np, _ = _importar_numpy_scipy()
+    reg_a = [normalizar_recurso(r) for r in antiguos]
+    reg_b = [normalizar_recurso(c) for c in candidatos]
+    sim_match = _similitud_coseno([r.match for r in reg_a], [r.match for r in reg_b])
+    if [r.sin_editoriales for r in reg_a + reg_b] == [r.match for r in reg_a + reg_b]:
+        sim_pub = sim_match
+    else:
+        sim_pub = _similitud_coseno([r.sin_editoriales for r in reg_a], [r.sin_editoriales for r in reg_b])
+    cobertura = None
+
+    parejas = []
+    for i, r24 in enumerate(antiguos):
+        j = int(np.argmax(sim_match[i]))
+        if sim_match[i, j] < 0.86:
+            sobre = np.flatnonzero(sim_pub[i] >= 0.92)
+            if sobre.size:
+                j = int(sobre[0])
+            else:
+                if cobertura is None:
+                    cobertura = _cobertura_vectorial([r.tokens for r in reg_a], [r.tokens for r in reg_b])
+                sobre = np.flatnonzero(cobertura[i] >= 0.9)
+                j = int(sobre[0]) if sobre.size else None
+        parejas.append((r24, candidatos[j] if j is not None else None))
+    return parejas
+
 # ====== Lectura robusta de recursos desde TXT ======
 BULLET_PREFIX_RE = re.compile(
     r"^[\s]*("
@@ -207,85 +675,131 @@ def leer_recursos_txt(ruta: str) -> set:
             recursos.add(s)
     return recursos
 
-# ====== Extra: justificación y separación de recursos ======
-def justify_line(line: str, width: int) -> str:
-    words = line.split()
-    if not words: return ""
-    if len(words) == 1: return words[0]
-    text_len = sum(len(w) for w in words)
-    total_spaces = width - text_len
-    if total_spaces <= len(words) - 1:
-        return " ".join(words)
-    gaps = len(words) - 1
-    base = total_spaces // gaps
-    extra = total_spaces % gaps
-    parts = []
-    for i, w in enumerate(words[:-1]):
-        pads = 1 + base + (1 if i < extra else 0)
-        parts.append(w + " " * pads)
-    parts.append(words[-1])
-    return "".join(parts)
-
-def justify_text(text: str, width: int) -> str:
-    if not text: return ""
-    wrapped = textwrap.wrap(text, width=width)
-    if not wrapped: return ""
-    lines = []
-    for i, ln in enumerate(wrapped):
-        lines.append(ln if i == len(wrapped) - 1 else justify_line(ln, width))
-    return "\n".join(lines)
-
-def format_entry(s: str) -> str:
-    return justify_text(s, JUSTIFY_WIDTH)
+# ====== Lectura de comparativas ya generadas ======
+CABECERA_SECCION_RE = re.compile(r"^(❌|📚|✅|📊)")
+SECCIONES_COMPARATIVA = {"❌": "eliminados", "📚": "comunes", "✅": "anadidos"}
+
+def leer_comparativa(ruta: str) -> dict[str, list[str]]:
+    """ {"eliminados", "comunes", "anadidos"} de una comparativa: del .json si existe y es de este mismo .txt (mtime y
+    tamaño) y si no del .txt, donde cada recurso es un bloque separado por líneas vacías (vale también para las antiguas
+    justificadas en varias líneas). """
+    try:
+        with open(ruta_sidecar(ruta), "r", encoding="utf-8") as f:
+            reg = json.load(f)
+        if registro_al_dia(reg, os.stat(ruta)):
+            return {clave: list(reg[clave]) for clave in SECCIONES_COMPARATIVA.values()}
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    secciones = {clave: [] for clave in SECCIONES_COMPARATIVA.values()}
+    actual, bloque = None, []
+
+    def volcar():
+        if actual and bloque:
+            texto = " ".join(" ".join(bloque).split())
+            if texto and texto != "No hay elementos.":
+                secciones[actual].append(texto)
+
+    with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+        for linea in f:
+            linea = linea.strip()
+            m = CABECERA_SECCION_RE.match(linea)
+            if m:
+                volcar()
+                actual, bloque = SECCIONES_COMPARATIVA.get(m.group(1)), []
+            elif not linea:
+                volcar()
+                bloque = []
+            elif SEPARATOR_RE.match(linea):
+                continue  # subrayado "-----" de la cabecera de sección
+            elif actual:
+                bloque.append(linea)
+    volcar()
+    return secciones
 
 # ====== Extraer nombre/código de asignatura ======
-def split_name_and_code_from_filename(filename: str) -> tuple[str, str | None]:
-    base = os.path.splitext(os.path.basename(filename))[0]
-    matches = list(re.finditer(r"[A-Za-z0-9]{3,}", base))
-    if not matches:
-        return base.strip(), None
-    last = matches[-1]
-    code = last.group(0)
-    name = (base[:last.start()] + base[last.end():]).strip()
-    name = re.sub(r"[\s\-_()]+$", "", name)
-    name = re.sub(r"^[\s\-_()]+", "", name)
-    name = re.sub(r"\s{2,}", " ", name).strip()
-    return (name or base).strip(), code
-
 def degree_code3_from_subject_code(subj_code: str) -> str:
     return subj_code[:3] if subj_code and len(subj_code) >= 3 else "000"
 
-# ====== Extraer nombre de grado y código desde carpeta ======
-def split_degree_name_and_code_from_folder(folder_name: str) -> tuple[str, str]:
-    raw = folder_name.strip()
-    parts = re.split(r"[-_]", raw)
-    if parts and re.fullmatch(r"[A-Za-z0-9]{3,}", parts[-1]):
-        cod3 = parts[-1][:3]
-        nombre = re.sub(r"[-_]*" + re.escape(parts[-1]) + r"$", "", raw).strip("-_")
-        if nombre.startswith("grado-"):
-            nombre = nombre[6:]
-        nombre = nombre or raw
-        return nombre, cod3
-    name = raw[6:] if raw.startswith("grado-") else raw
-    return name or "desconocido", "000"
-
 # ====== Indexado por año ======
-def index_year_folder(root: str) -> dict[str, tuple[str, str, str]]:
-    idx = {}
-    if not os.path.isdir(root): return idx
-    for sub in os.listdir(root):
-        subdir = os.path.join(root, sub)
-        if not os.path.isdir(subdir): continue
-        grado_nombre, _ = split_degree_name_and_code_from_folder(os.path.basename(subdir))
-        for fn in os.listdir(subdir):
-            if not fn.endswith(".txt"): continue
-            nombre_asig, codigo = split_name_and_code_from_filename(fn)
-            if not codigo: continue
-            idx[codigo] = (os.path.join(subdir, fn), nombre_asig, grado_nombre)
-    return idx
+# split_name_and_code_from_filename, split_degree_name_and_code_from_folder e index_year_folder viven en
+# indice_carpetas.py, que cachea en disco el índice de cada carpeta de curso (ver import al principio)
 
 # ====== Comparación ======
-def comparar_sets(recursos_2024: set, recursos_2025: set):
+def _buscar_candidato_lineal(r24: str, candidatos: list[str]):
+    cand, score = best_match(r24, candidatos, threshold=0.86)
+    if not cand:
+        r24_pub = normalizar_recurso(r24).sin_editoriales
+        for c in candidatos:
+            if ratio(r24_pub, normalizar_recurso(c).sin_editoriales) >= 0.92:
+                cand, score = c, 0.92
+                break
+    if not cand:
+        for c in candidatos:
+            if token_coverage_equal(r24, c, threshold=0.9):
+                cand, score = c, 0.91
+                break
+    return cand, score
+
+def _buscar_candidato_indexado(r24: str, indice: dict):
+    candidatos = indice["candidatos"]
+    reg = normalizar_recurso(r24)
+    pos, score = best_match_indexado(reg.match, indice["match"], threshold=0.86)
+    cand = candidatos[pos] if pos is not None else None
+    if not cand:
+        pos = primer_match_indexado(reg.sin_editoriales, indice["pub"], 0.92)
+        if pos is not None:
+            cand, score = candidatos[pos], 0.92
+        if not cand:
+            pos = primer_cobertura_indexada(reg.tokens, indice["tokens"], threshold=0.9)
+            if pos is not None:
+                cand, score = candidatos[pos], 0.91
+    return cand, score
+
+def emparejar(set_2024: set, set_2025: set, usar_indice: bool = True, motor: str = "difflib") -> list[tuple]:
+    """ Candidato nuevo elegido para cada recurso antiguo (None si no hay), en orden alfabético de set_2024.
+    Cada decisión es independiente de las demás porque set_2025 no se modifica mientras se empareja. Las uniones
+    exactas de unir_por_claves se resuelven antes y solo el resto pasa por el motor difuso. Los candidatos se recorren
+    en orden alfabético, así que los empates se deshacen igual sea cual sea el orden en que se construyeron los sets
+    (y el resultado se puede memorizar por contenido). """
+    if motor not in MOTORES:
+        raise ValueError(f"Motor desconocido: {motor} (opciones: {', '.join(MOTORES)})")
+    antiguos = sorted(set_2024)
+    candidatos = sorted(set_2025)
+    with fase("exacto", len(antiguos)):
+        unidos = unir_por_claves(antiguos, candidatos)
+        difusos = [r24 for r24 in antiguos if r24 not in unidos]
+    with fase("difuso", len(difusos)):
+        if not difusos:
+            elegidos = {}
+        elif motor == "ngramas":
+            elegidos = dict(emparejar_ngramas(difusos, candidatos))
+        elif usar_indice:
+            # La lista conserva el orden de candidatos (y por tanto los desempates)
+            indice = construir_indice_candidatos(candidatos)
+            elegidos = {r24: _buscar_candidato_indexado(r24, indice)[0] for r24 in difusos}
+        else:
+            elegidos = {r24: _buscar_candidato_lineal(r24, candidatos)[0] for r24 in difusos}
+    return [(r24, unidos[r24] if r24 in unidos else elegidos[r24]) for r24 in antiguos]
+
+def comparar_sets(recursos_2024: set, recursos_2025: set, usar_indice: bool = True, motor: str = "difflib"):
+    """ usar_indice=False conserva el recorrido lineal original (útil para comparar resultados y tiempos). El resultado
+    se memoriza en el catálogo del proceso por pareja de bibliografías (como tuplas; cada llamada recibe sus propias
+    listas). """
+    if len(_catalogo) >= CATALOGO_MAX_TEXTOS:
+        vaciar_catalogo()
+    clave = (ids_catalogo(recursos_2024), ids_catalogo(recursos_2025), usar_indice, motor)
+    resultado = _comparaciones_catalogo.get(clave)
+    if resultado is not None:
+        with fase("repetida", len(recursos_2024) + len(recursos_2025)):
+            eliminados, comunes, anadidos, porcentaje = resultado
+            return list(eliminados), list(comunes), list(anadidos), porcentaje
+    if len(_comparaciones_catalogo) >= CATALOGO_MAX_ASIGNATURAS:
+        _comparaciones_catalogo.clear()
+    eliminados, comunes, anadidos, porcentaje = _comparar_sets(recursos_2024, recursos_2025, usar_indice, motor)
+    _comparaciones_catalogo[clave] = (tuple(eliminados), tuple(comunes), tuple(anadidos), porcentaje)
+    return eliminados, comunes, anadidos, porcentaje
+
+def _comparar_sets(recursos_2024: set, recursos_2025: set, usar_indice: bool, motor: str):
     set_2024 = set(recursos_2024)
     set_2025 = set(recursos_2025)
 
@@ -298,37 +812,28 @@ def comparar_sets(recursos_2024: set, recursos_2025: set):
     changed_old = []
     changed_new = []
 
-    for r24 in list(set_2024):
-        cand, score = best_match(r24, set_2025, threshold=0.86)
-        if not cand:
-            for c in set_2025:
-                if ratio(normalize_without_publishers(r24), normalize_without_publishers(c)) >= 0.92:
-                    cand, score = c, 0.92
-                    break
-        if not cand:
-            for c in set_2025:
-                if token_coverage_equal(r24, c, threshold=0.9):
-                    cand, score = c, 0.91
-                    break
-        if not cand:
-            continue
-
-        core1 = normalize_without_years_editions(r24)
-        core2 = normalize_without_years_editions(cand)
-        core_eq = (ratio(core1, core2) >= 0.90) or token_coverage_equal(r24, cand, threshold=0.9)
-        if core_eq:
-            y_old = years_anywhere(r24)
-            y_new = years_anywhere(cand)
-            if y_old and y_new and y_old != y_new:
-                changed_old.append(r24)
-                changed_new.append(cand)
-                emp_24.add(r24); emp_25.add(cand)
+    parejas = emparejar(set_2024, set_2025, usar_indice=usar_indice, motor=motor)
+    with fase("clasificacion", len(parejas)):
+        for r24, cand in parejas:
+            if not cand:
+                continue
+
+            reg_old, reg_new = normalizar_recurso(r24), normalizar_recurso(cand)
+            core_eq = ((ratio_catalogado(reg_old.sin_anios, reg_new.sin_anios) >= 0.90)
+                       or cobertura_tokens(reg_old.tokens, reg_new.tokens, threshold=0.9))
+            if core_eq:
+                y_old = reg_old.anios
+                y_new = reg_new.anios
+                if y_old and y_new and y_old != y_new:
+                    changed_old.append(r24)
+                    changed_new.append(cand)
+                    emp_24.add(r24); emp_25.add(cand)
+                else:
+                    iguales.add(pick_longer_with_year(r24, cand))
+                    emp_24.add(r24); emp_25.add(cand)
             else:
-                iguales.add(pick_longer_with_year(r24, cand))
+                iguales.add(cand)
                 emp_24.add(r24); emp_25.add(cand)
-        else:
-            iguales.add(cand)
-            emp_24.add(r24); emp_25.add(cand)
 
     restantes_eliminados = sorted(set_2024 - emp_24)
     restantes_anadidos = sorted(set_2025 - emp_25)
@@ -353,7 +858,8 @@ def build_comparativa_path(dest_root: str, nombre_grado: str, grado_code3: str,
 """ Si se quisiera modificar el formato o los elementos que se muestran en los archivos generados de comparativa, ahora
 es el momento para hacerlo, ya que escribir_comparativa hace precisamente eso"""
 def escribir_comparativa(dest_root: str, nombre_grado: str, grado_code3: str, nombre_asignatura: str, subj_code: str,
-                         eliminados: list[str], comunes: list[str], anadidos: list[str], porcentaje: float):
+                         eliminados: list[str], comunes: list[str], anadidos: list[str], porcentaje: float,
+                         metadatos: dict | None = None):
     grado_dirname = f"{slugify_nombre(nombre_grado, use_underscores=False)}_{grado_code3}"
     asig_filename = f"{slugify_nombre(nombre_asignatura, use_underscores=True)}_{subj_code}.txt"
     grado_path = os.path.join(dest_root, grado_dirname)
@@ -365,11 +871,13 @@ def escribir_comparativa(dest_root: str, nombre_grado: str, grado_code3: str, no
     def _print_list(f, items):
         if items:
             for r in items:
-                f.write(format_entry(r) + "\n\n")
+                f.write((format_entry(r) if JUSTIFICAR_SALIDA else r) + "\n\n")
         else:
             f.write("No hay elementos.\n\n")
 
-    with open(out_path, "w", encoding="utf-8") as f:
+    # Se escribe a un .tmp y se renombra: quien lea la comparativa mientras se regenera (app.py) ve la versión anterior
+    # o la nueva completa, nunca una a medias
+    with open(out_path + ".tmp", "w", encoding="utf-8") as f:
         f.write(f"{nombre_asignatura} ({subj_code})\n")
         f.write(f"Grado: {nombre_grado} ({grado_code3})\n")
         f.write("\n\n")
@@ -390,86 +898,455 @@ def escribir_comparativa(dest_root: str, nombre_grado: str, grado_code3: str, no
         f.write("📊 Porcentaje estimado de cambio: ")
         f.write(f"{int(porcentaje_limitado * 100)}% ")
         f.write(f"[{'█' * int(porcentaje_limitado * 10)}{'░' * (10 - int(porcentaje_limitado * 10))}]\n")
+    os.replace(out_path + ".tmp", out_path)
+    st = os.stat(out_path)
+
+    registro = {
+        "codigo": subj_code,
+        "asignatura": nombre_asignatura,
+        "grado": nombre_grado,
+        "grado_codigo": grado_code3,
+        "archivo": asig_filename,
+        "eliminados": eliminados,
+        "comunes": comunes,
+        "anadidos": anadidos,
+        "porcentaje": round(min(max(porcentaje, 0.0), 1.0), 4),
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "txt_mtime_ns": st.st_mtime_ns,
+        "txt_size": st.st_size,
+        **(metadatos or {}),
+    }
+    sidecar = ruta_sidecar(out_path)
+    with open(sidecar + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(registro, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(sidecar + ".tmp", sidecar)
+
+def ruta_sidecar(out_path: str) -> str:
+    return os.path.splitext(out_path)[0] + ".json"
+
+def registro_al_dia(registro: dict, st: os.stat_result) -> bool:
+    """ True si el registro (.json o línea de INDICE_GRADO) se escribió a partir de este mismo .txt. """
+    return registro.get("txt_mtime_ns") == st.st_mtime_ns and registro.get("txt_size") == st.st_size
+
+def resumen_registro(registro: dict) -> dict:
+    """ Línea del índice de grado: todo menos las listas de recursos, que se sustituyen por sus tamaños. """
+    linea = {k: v for k, v in registro.items() if k not in ("eliminados", "comunes", "anadidos")}
+    for clave in ("eliminados", "comunes", "anadidos"):
+        linea[f"n_{clave}"] = len(registro.get(clave, []))
+    return linea
+
+def escribir_indice_grado(grado_path: str) -> int:
+    """ Regenera INDICE_GRADO a partir de los .json de la carpeta; si ya no queda ninguna comparativa, borra la carpeta.
+    Devuelve el número de asignaturas indexadas. """
+    indice_path = os.path.join(grado_path, INDICE_GRADO)
+    lineas = []
+    for fn in sorted(os.listdir(grado_path)) if os.path.isdir(grado_path) else []:
+        if not fn.endswith(".json") or fn == INDICE_GRADO:
+            continue
+        try:
+            with open(os.path.join(grado_path, fn), "r", encoding="utf-8") as f:
+                lineas.append(resumen_registro(json.load(f)))
+        except (OSError, ValueError):
+            continue
+    if not lineas:
+        if os.path.exists(indice_path):
+            os.remove(indice_path)
+        if os.path.isdir(grado_path) and not os.listdir(grado_path):
+            os.rmdir(grado_path)
+        return 0
+    tmp = indice_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"grado": os.path.basename(grado_path), "asignaturas": lineas}, f,
+                  ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, indice_path)
+    return len(lineas)
 
 # ====== Indexado con nombres ======
 def index_year_folder_with_names(root: str) -> dict[str, tuple[str, str, str]]:
     return index_year_folder(root)
 
+# ====== Manifiesto de entradas (reconstrucción incremental) ======
+def hash_archivo(ruta: str) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 16), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+def cargar_manifiesto(ruta: str = MANIFIESTO_PATH) -> dict[str, dict]:
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        return datos.get("asignaturas", {}) if isinstance(datos, dict) else {}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def guardar_manifiesto(entradas: dict[str, dict], ruta: str = MANIFIESTO_PATH):
+    tmp = ruta + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"matcher_version": MATCHER_VERSION, "asignaturas": entradas}, f,
+                  ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, ruta)
+
+def entrada_vigente(entrada: dict | None, hash24: str, hash25: str, out_path: str, motor: str) -> bool:
+    return bool(entrada) \
+        and entrada.get("hash_old") == hash24 and entrada.get("hash_new") == hash25 \
+        and entrada.get("version") == MATCHER_VERSION and entrada.get("motor", "difflib") == motor \
+        and entrada.get("salida") == os.path.relpath(out_path, COMPARATIVAS_BASE) \
+        and os.path.exists(out_path)
+
+def reservar_resumen(carpeta: str) -> tuple[str, str]:
+    """ Crea vacío Resumen_<marca>.txt y devuelve su ruta y la marca (que comparten el .json y el informe de motores).
+    La marca lleva microsegundos y el archivo se abre en exclusiva ("x"), con un contador si ya existe: dos ejecuciones
+    en el mismo segundo no se pisan el resumen. """
+    base = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    n = 0
+    while True:
+        marca = base if n == 0 else f"{base}_{n}"
+        ruta = os.path.join(carpeta, f"Resumen_{marca}.txt")
+        try:
+            with open(ruta, "x", encoding="utf-8"):
+                return ruta, marca
+        except FileExistsError:
+            n += 1
+
+def borrar_salida(rel_path: str | None) -> bool:
+    """ Borra una comparativa (ruta relativa a COMPARATIVAS_BASE) y su .json. La carpeta de grado se limpia al
+    regenerar su índice (escribir_indice_grado). """
+    if not rel_path:
+        return False
+    ruta = os.path.join(COMPARATIVAS_BASE, rel_path)
+    if os.path.exists(ruta_sidecar(ruta)):
+        os.remove(ruta_sidecar(ruta))
+    if not os.path.exists(ruta):
+        return False
+    os.remove(ruta)
+    return True
+
+# ====== Diferencias entre motores ======
+def diferencias_entre_motores(rec24: set, rec25: set) -> tuple[int, int]:
+    """ Empareja con difflib y con ngramas y devuelve (decisiones tomadas, decisiones distintas). """
+    set_2024, set_2025 = set(rec24) - set(rec25), set(rec25) - set(rec24)
+    por_difflib = dict(emparejar(set_2024, set_2025, motor="difflib"))
+    por_ngramas = dict(emparejar(set_2024, set_2025, motor="ngramas"))
+    distintas = sum(1 for r24, cand in por_difflib.items() if por_ngramas.get(r24) != cand)
+    return len(por_difflib), distintas
+
 # ====== Worker multiproceso ======
 def worker_compare_and_write(job):
     """
-    job: (subj_code, ruta24, ruta25, nombre_asig, nombre_grado, grado_code3, out_path_base)
-    Devuelve (subj_code, n24, n25, n_comunes, n_add, n_del, written_bool, out_path)
+    job: (subj_code, ruta24, ruta25, nombre_asig, nombre_grado, grado_code3, out_path_base, motor, informe_motores,
+          metadatos)  (metadatos = entrada del manifiesto + fechas de las guías, se copian al .json)
+    Devuelve (subj_code, n24, n25, n_comunes, n_add, n_del, written_bool, out_path, diferencias)
+    donde diferencias es (decisiones, distintas) si se pidió el informe de motores y None si no.
     """
-    (subj_code, ruta24, ruta25, nombre_asig, nombre_grado, grado_code3, out_base) = job
+    (subj_code, ruta24, ruta25, nombre_asig, nombre_grado, grado_code3, out_base, motor, informe_motores,
+     metadatos) = job
 
-    # Saltar si ya existe (doble salvaguarda)
     out_path = build_comparativa_path(out_base, nombre_grado, grado_code3, nombre_asig, subj_code)
-    if os.path.exists(out_path):
-        return (subj_code, 0, 0, 0, 0, 0, False, out_path)
-
-    rec24 = leer_recursos_txt(ruta24)
-    rec25 = leer_recursos_txt(ruta25)
-    eliminados, comunes, anadidos, pct = comparar_sets(rec24, rec25)
-    escribir_comparativa(out_base, nombre_grado, grado_code3, nombre_asig, subj_code, eliminados, comunes, anadidos, pct)
-
-    return (subj_code, len(rec24), len(rec25), len(comunes), len(anadidos), len(eliminados), True, out_path)
+    with fase("lectura", 2):
+        rec24 = leer_recursos_txt(ruta24)
+        rec25 = leer_recursos_txt(ruta25)
+    eliminados, comunes, anadidos, pct = comparar_sets(rec24, rec25, motor=motor)
+    with fase("escritura", 1):
+        escribir_comparativa(out_base, nombre_grado, grado_code3, nombre_asig, subj_code, eliminados, comunes,
+                             anadidos, pct, metadatos=metadatos)
+    diferencias = None
+    if informe_motores:
+        with fase("informe_motores", 1), fases_suspendidas():
+            diferencias = diferencias_entre_motores(rec24, rec25)
+
+    return (subj_code, len(rec24), len(rec25), len(comunes), len(anadidos), len(eliminados), True, out_path,
+            diferencias)
+
+_perfil: cProfile.Profile | None = None
+
+def worker_compare_batch(lote, perfil_dir: str | None = None):
+    """
+    Procesa un lote de jobs (normalmente uno o varios grados completos) en el mismo proceso, de modo que el coste de
+    enviar trabajos y resultados entre procesos se paga una vez por lote y la caché de normalización se aprovecha.
+    Devuelve (resultados, errores, metricas): la lista de tuplas de worker_compare_and_write, la de (subj_code, mensaje)
+    y las métricas del lote ({"pid", "fases", "asignaturas": [(codigo, segundos, cpu, n24, n25)], "catalogo"}).
+    Con perfil_dir, cada proceso acumula un cProfile de todos sus lotes en perfil_dir/perfil_worker_<pid>.prof.
+    """
+    global _perfil
+    if perfil_dir and _perfil is None:
+        _perfil = cProfile.Profile()
+    if perfil_dir:
+        _perfil.enable()
+    resultados, errores, asignaturas = [], [], []
+    try:
+        for job in lote:
+            t0, c0 = time.perf_counter(), time.process_time()
+            try:
+                resultados.append(worker_compare_and_write(job))
+            except Exception as e:
+                errores.append((job[0], str(e)))
+                continue
+            n24, n25 = resultados[-1][1], resultados[-1][2]
+            asignaturas.append((job[0], time.perf_counter() - t0, time.process_time() - c0, n24, n25))
+    finally:
+        if perfil_dir:
+            _perfil.disable()
+            os.makedirs(perfil_dir, exist_ok=True)
+            _perfil.dump_stats(os.path.join(perfil_dir, f"perfil_worker_{os.getpid()}.prof"))
+    metricas = {"pid": os.getpid(), "fases": extraer_fases(), "asignaturas": asignaturas,
+                "catalogo": estadisticas_catalogo()}
+    return resultados, errores, metricas
+
+def agrupar_en_lotes(jobs_por_grado: dict[str, list], costes: dict[str, int], tam_lote: int) -> list[list]:
+    """
+    Empaqueta grados completos (carpeta *_NNN de salida) en lotes de hasta tam_lote asignaturas; un grado más grande
+    que tam_lote se trocea. Los lotes se devuelven de más a menos costosos para que los últimos en terminar sean cortos
+    y todos los núcleos sigan ocupados hasta el final.
+    """
+    tam_lote = max(1, tam_lote)
+    lotes, actual = [], []
+    for grado in sorted(jobs_por_grado):
+        trabajos = jobs_por_grado[grado]
+        if actual and len(actual) + len(trabajos) > tam_lote:
+            lotes.append(actual)
+            actual = []
+        for i in range(0, len(trabajos), tam_lote):
+            trozo = trabajos[i:i + tam_lote]
+            if len(trozo) == tam_lote:
+                lotes.append(trozo)
+            else:
+                actual.extend(trozo)
+    if actual:
+        lotes.append(actual)
+    return sorted(lotes, key=lambda lote: -sum(costes.get(job[0], 0) for job in lote))
 
 # ====== Recorrido principal ======
-def main():
-    print("📁 Indexando 2024-2025…")
-    idx24 = index_year_folder_with_names(BASE_OLD)
-    print(f" → {len(idx24)} asignaturas indexadas")
-
-    print("📁 Indexando 2025-2026…")
-    idx25 = index_year_folder_with_names(BASE_NEW)
-    print(f" → {len(idx25)} asignaturas indexadas")
+def main(argv=None, callback=None):
+    """ callback(porcentaje, etiqueta), opcional, recibe el progreso tras cada lote (lo usa app.py). """
+    parser = argparse.ArgumentParser(description="Genera las comparativas de bibliografía entre cursos")
+    parser.add_argument("--forzar", action="store_true",
+                        help="Recalcula todas las asignaturas aunque el manifiesto indique que no han cambiado")
+    parser.add_argument("--motor", choices=MOTORES, default="difflib",
+                        help="Motor de similitud: difflib (SequenceMatcher) o ngramas (trigramas con numpy/scipy)")
+    parser.add_argument("--informe-motores", action="store_true",
+                        help="Empareja también con el otro motor e informa de cuántas decisiones difieren "
+                             "(implica --forzar para cubrir todas las asignaturas)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Número de procesos")
+    parser.add_argument("--tam-lote", type=int, default=TAM_LOTE,
+                        help="Máximo de asignaturas por lote (se agrupan grados completos)")
+    parser.add_argument("--perfil", nargs="?", const="perfiles_comparar", default=None, metavar="CARPETA",
+                        help="Guarda un cProfile por worker en CARPETA (por defecto perfiles_comparar)")
+    parser.add_argument("--sin-busqueda", action="store_true",
+                        help="No actualiza al final el índice de búsqueda de app.py (lo usan la app, que lo actualiza "
+                             "por su cuenta, y el benchmark)")
+    args = parser.parse_args(argv)
+    t_inicio = time.perf_counter()
+    os.makedirs(COMPARATIVAS_BASE, exist_ok=True)
+
+    if args.motor == "ngramas" or args.informe_motores:
+        try:
+            _importar_numpy_scipy()
+        except RuntimeError as e:
+            print(f"❗ {e}")
+            return
+
+    with fase("indexado", 2):
+        print("📁 Indexando 2024-2025…")
+        idx24 = index_year_folder_with_names(BASE_OLD)
+        print(f" → {len(idx24)} asignaturas indexadas")
+
+        print("📁 Indexando 2025-2026…")
+        idx25 = index_year_folder_with_names(BASE_NEW)
+        print(f" → {len(idx25)} asignaturas indexadas")
 
     codigos_comunes = sorted(set(idx24.keys()) & set(idx25.keys()))
     print(f"🔗 Códigos comunes: {len(codigos_comunes)}")
 
-    # Construir trabajos y filtrar los que ya existen
+    manifiesto = cargar_manifiesto()
+    forzar = args.forzar or args.informe_motores
+    nuevo_manifiesto = {}
+
+    # Construir trabajos y filtrar los que no han cambiado desde la última ejecución
     jobs = []
+    jobs_por_grado = defaultdict(list)
+    grado_de = {}
+    costes = {}
+    pendientes = {}
     already = 0
-    for subj_code in codigos_comunes:
-        ruta24, asig24, grado24 = idx24[subj_code]
-        ruta25, asig25, grado25 = idx25[subj_code]
-        nombre_asig = asig25 if asig25 else asig24
-        nombre_grado = grado25 if grado25 else grado24
-        grado_code3 = degree_code3_from_subject_code(subj_code)
-
-        out_path = build_comparativa_path(COMPARATIVAS_BASE, nombre_grado, grado_code3, nombre_asig, subj_code)
-        if os.path.exists(out_path):
-            already += 1
-            continue
-
-        jobs.append((subj_code, ruta24, ruta25, nombre_asig, nombre_grado, grado_code3, COMPARATIVAS_BASE))
-
-    print(f"🚀 Tareas a generar: {len(jobs)} (ya existentes: {already})")
+    with fase("manifiesto", len(codigos_comunes)):
+        for subj_code in codigos_comunes:
+            ruta24, asig24, grado24 = idx24[subj_code]
+            ruta25, asig25, grado25 = idx25[subj_code]
+            nombre_asig = asig25 if asig25 else asig24
+            nombre_grado = grado25 if grado25 else grado24
+            grado_code3 = degree_code3_from_subject_code(subj_code)
+
+            out_path = build_comparativa_path(COMPARATIVAS_BASE, nombre_grado, grado_code3, nombre_asig, subj_code)
+            hash24, hash25 = hash_archivo(ruta24), hash_archivo(ruta25)
+            previa = manifiesto.get(subj_code)
+            if not forzar and entrada_vigente(previa, hash24, hash25, out_path, args.motor):
+                nuevo_manifiesto[subj_code] = previa
+                already += 1
+                continue
+
+            # Si la asignatura cambió de nombre o de grado, la comparativa antigua queda huérfana
+            if previa and previa.get("salida") != os.path.relpath(out_path, COMPARATIVAS_BASE):
+                borrar_salida(previa.get("salida"))
+            pendientes[subj_code] = {"hash_old": hash24, "hash_new": hash25, "version": MATCHER_VERSION,
+                                     "motor": args.motor, "salida": os.path.relpath(out_path, COMPARATIVAS_BASE)}
+            metadatos = {**pendientes[subj_code],
+                         "fecha_old": datetime.fromtimestamp(os.path.getmtime(ruta24)).isoformat(timespec="seconds"),
+                         "fecha_new": datetime.fromtimestamp(os.path.getmtime(ruta25)).isoformat(timespec="seconds")}
+            job = (subj_code, ruta24, ruta25, nombre_asig, nombre_grado, grado_code3, COMPARATIVAS_BASE,
+                   args.motor, args.informe_motores, metadatos)
+            jobs.append(job)
+            grado_de[subj_code] = os.path.dirname(out_path)
+            jobs_por_grado[grado_de[subj_code]].append(job)
+            # El emparejamiento crece con n·m: el producto de tamaños es una buena estimación del coste
+            costes[subj_code] = os.path.getsize(ruta24) * os.path.getsize(ruta25)
+
+    borradas = 0
+    grados_tocados = set(grado_de.values())
+    for subj_code, previa in manifiesto.items():
+        if previa.get("salida") and (subj_code in pendientes or subj_code not in codigos_comunes):
+            grados_tocados.add(os.path.dirname(os.path.join(COMPARATIVAS_BASE, previa["salida"])))
+    for subj_code in sorted(set(manifiesto) - set(codigos_comunes)):
+        if borrar_salida(manifiesto[subj_code].get("salida")):
+            borradas += 1
+            print(f"🗑 {subj_code}: ya no existe en ambos cursos → comparativa eliminada")
+
+    lotes = agrupar_en_lotes(jobs_por_grado, costes, args.tam_lote)
+    print(f"🚀 Tareas a generar: {len(jobs)} en {len(lotes)} lotes (sin cambios: {already})")
 
     generadas = 0
-    if jobs:
-        with ProcessPoolExecutor(max_workers=MAX_WORKERS) as ex:
-            futures = [ex.submit(worker_compare_and_write, job) for job in jobs]
-            for fut in as_completed(futures):
-                try:
-                    subj_code, n24, n25, ncom, nadd, ndel, wrote, outp = fut.result()
-                    if wrote:
-                        generadas += 1
-                        print(f"✔ {subj_code}: 2024={n24} | 2025={n25} | comunes={ncom} | +{nadd} | -{ndel}")
-                    else:
-                        print(f"⏭ {subj_code}: ya existía → {outp}")
-                except Exception as e:
-                    print(f"❗ Error en tarea: {e}")
+    errores_totales = 0
+    procesadas = 0
+    diferencias_por_codigo = {}
+    por_worker = {}
+    tiempos_asignaturas = []
+    # Los workers se crean con fork: se vacían antes las métricas del proceso principal para que no las hereden
+    fases_principal = extraer_fases()
+    try:
+        with fase("lotes", len(jobs)):
+            if lotes:
+                with ProcessPoolExecutor(max_workers=max(1, args.workers)) as ex:
+                    futures = {ex.submit(worker_compare_batch, lote, args.perfil): lote for lote in lotes}
+                    for n, fut in enumerate(as_completed(futures), 1):
+                        lote = futures[fut]
+                        procesadas += len(lote)
+                        try:
+                            resultados, errores, metricas = fut.result()
+                        except Exception as e:
+                            errores = [(job[0], str(e)) for job in lote]
+                            resultados, metricas = [], None
+                        if metricas:
+                            w = por_worker.setdefault(metricas["pid"], {"lotes": 0, "asignaturas": 0, "fases": {}})
+                            w["lotes"] += 1
+                            w["asignaturas"] += len(metricas["asignaturas"])
+                            w["catalogo"] = metricas["catalogo"]
+                            sumar_fases(w["fases"], metricas["fases"])
+                            tiempos_asignaturas.extend(metricas["asignaturas"])
+                        for subj_code, n24, n25, ncom, nadd, ndel, wrote, outp, diferencias in resultados:
+                            if diferencias is not None:
+                                diferencias_por_codigo[subj_code] = diferencias
+                            if wrote:
+                                generadas += 1
+                                nuevo_manifiesto[subj_code] = pendientes[subj_code]
+                        for subj_code, mensaje in errores:
+                            print(f"❗ Error en {subj_code}: {mensaje}")
+                        errores_totales += len(errores)
+                        grados = sorted({os.path.basename(grado_de[job[0]]) for job in lote})
+                        etiqueta = grados[0] + (f" +{len(grados) - 1}" if len(grados) > 1 else "")
+                        print(f"📦 Lote {n}/{len(lotes)} [{etiqueta}]: {len(resultados)} generadas, "
+                              f"{len(errores)} errores · {procesadas}/{len(jobs)} asignaturas")
+                        if callback:
+                            callback(int(procesadas / len(jobs) * 100), f"Lote {n}/{len(lotes)}")
+    finally:
+        # Las asignaturas que fallan (o que no llegan a procesarse) siguen en el manifiesto con su salida, para que su
+        # comparativa anterior no quede en disco sin rastrear; sin hashes, la próxima ejecución las vuelve a calcular
+        for subj_code, entrada in pendientes.items():
+            if subj_code not in nuevo_manifiesto:
+                nuevo_manifiesto[subj_code] = {**entrada, "hash_old": None, "hash_new": None}
+        guardar_manifiesto(nuevo_manifiesto)
+
+    # Índices por grado: se regeneran los de carpetas con cambios y los que falten
+    for subj_code, entrada in nuevo_manifiesto.items():
+        carpeta = os.path.dirname(os.path.join(COMPARATIVAS_BASE, entrada["salida"]))
+        if not os.path.exists(os.path.join(carpeta, INDICE_GRADO)):
+            grados_tocados.add(carpeta)
+    with fase("indices_grado", len(grados_tocados)):
+        for carpeta in sorted(grados_tocados):
+            escribir_indice_grado(carpeta)
 
     # Resumen global
-    resumen_path = os.path.join(COMPARATIVAS_BASE, f"Resumen_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+    resumen_path, marca = reservar_resumen(COMPARATIVAS_BASE)
     with open(resumen_path, "w", encoding="utf-8") as f:
         f.write("📘 Resumen de comparativas (por código):\n")
         f.write("=" * 40 + "\n")
+        f.write(f"Motor de similitud: {args.motor}\n")
         f.write(f"Total asignaturas con código común: {len(codigos_comunes)}\n")
         f.write(f"Comparativas generadas en esta ejecución: {generadas}\n")
-        f.write(f"Comparativas ya existentes (omitidas): {already}\n")
+        f.write(f"Comparativas con error: {errores_totales}\n")
+        f.write(f"Comparativas sin cambios en sus guías (omitidas): {already}\n")
+        f.write(f"Comparativas eliminadas (códigos desaparecidos): {borradas}\n")
+        if args.informe_motores:
+            escribir_informe_motores(os.path.join(COMPARATIVAS_BASE, f"Informe_motores_{marca}.txt"),
+                                     diferencias_por_codigo, f)
+        fases_workers = {}
+        for w in por_worker.values():
+            sumar_fases(fases_workers, w["fases"])
+        segundos_total = time.perf_counter() - t_inicio
+        f.write(f"Tiempo total: {segundos_total:.1f} s" + (f" con {len(por_worker)} workers" if por_worker else "") + "\n")
+        if fases_workers:
+            f.write("Tiempo en workers por fase (s): " + ", ".join(
+                f"{nombre}={m['segundos']:.1f}" for nombre, m in sorted(fases_workers.items())) + "\n")
+        f.write(f"Métricas detalladas: Resumen_{marca}.json\n")
+
+    sumar_fases(fases_principal, extraer_fases())
+    nombres = {codigo: (idx25[codigo][1], idx25[codigo][2]) for codigo in codigos_comunes}
+    mas_lentas = sorted(tiempos_asignaturas, key=lambda t: -t[1])[:N_MAS_LENTAS]
+    metricas_json = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "motor": args.motor,
+        "workers": args.workers,
+        "tam_lote": args.tam_lote,
+        "contadores": {"asignaturas_comunes": len(codigos_comunes), "generadas": generadas,
+                       "errores": errores_totales, "sin_cambios": already, "eliminadas": borradas,
+                       "lotes": len(lotes)},
+        "segundos_total": round(segundos_total, 4),
+        "fases_principal": redondear_fases(fases_principal),
+        "fases_workers": redondear_fases(fases_workers),
+        "por_worker": {str(pid): {**w, "fases": redondear_fases(w["fases"])} for pid, w in sorted(por_worker.items())},
+        "mas_lentas": [{"codigo": codigo, "asignatura": nombres[codigo][0], "grado": nombres[codigo][1],
+                        "segundos": round(seg, 4), "cpu": round(cpu, 4), "recursos_old": n24, "recursos_new": n25}
+                       for codigo, seg, cpu, n24, n25 in mas_lentas],
+        "perfiles": args.perfil,
+    }
+    with open(os.path.join(COMPARATIVAS_BASE, f"Resumen_{marca}.json"), "w", encoding="utf-8") as f:
+        json.dump(metricas_json, f, ensure_ascii=False, indent=1)
+    print(f"⏱ Tiempo total {segundos_total:.1f} s · métricas en Resumen_{marca}.json")
+
+    if args.sin_busqueda:
+        return
+    # Deja al día el índice de búsqueda de app.py (solo se reindexan las comparativas que han cambiado)
+    import buscador
+    cuentas = buscador.actualizar_indice([COMPARATIVAS_BASE])
+    print(f"🔎 Índice de búsqueda: {cuentas['nuevos']} nuevas, {cuentas['actualizados']} actualizadas, "
+          f"{cuentas['borrados']} borradas")
+
+def escribir_informe_motores(ruta: str, diferencias_por_codigo: dict[str, tuple[int, int]], resumen):
+    decisiones = sum(d for d, _ in diferencias_por_codigo.values())
+    distintas = sum(x for _, x in diferencias_por_codigo.values())
+    con_diferencias = sorted(((x, d, codigo) for codigo, (d, x) in diferencias_por_codigo.items() if x),
+                             key=lambda t: (-t[0], t[2]))
+    pct = distintas / decisiones * 100 if decisiones else 0.0
+    linea = (f"Decisiones difflib vs ngramas: {distintas} distintas de {decisiones} ({pct:.2f}%) "
+             f"en {len(con_diferencias)} de {len(diferencias_por_codigo)} asignaturas\n")
+    resumen.write(linea)
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("🆚 Informe de diferencias entre motores (difflib vs ngramas):\n")
+        f.write("=" * 40 + "\n")
+        f.write(linea + "\n")
+        for distintas_asig, decisiones_asig, codigo in con_diferencias:
+            f.write(f"{codigo}: {distintas_asig} de {decisiones_asig} decisiones distintas\n")
+    print(f"🆚 {linea.strip()} → {ruta}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,144 @@
+""" Paso de compilación de los estáticos de la web (static/ → static/build/).
+
+- h4.jpg (fondo de página, ~1 MB) se reduce a varios anchos en AVIF, WebP y JPEG; la hoja de estilos compilada elige
+  la variante con media queries + image-set(), así un móvil descarga unas decenas de KB en lugar de la foto original.
+- UGR.png (logo que se muestra a 80 px de alto) se genera a 1x/2x/3x en AVIF, WebP y PNG para el <picture> con srcset.
+- style.css se copia con esas reglas añadidas al final y con la huella del contenido en el nombre (style.<hash>.css).
+
+Todos los archivos generados llevan la huella en el nombre, así que app.py los sirve con caché inmutable. El resultado
+se describe en static/build/manifest.json, que es lo que lee app.py; si no existe, la web usa los originales.
+Requiere Pillow (AVIF solo si la instalación de Pillow lo soporta).
+
+Uso: python construir_estaticos.py
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from io import BytesIO
+
+from PIL import Image, features
+
+STATIC_DIR = "static"
+BUILD_DIR = os.path.join(STATIC_DIR, "build")
+MANIFEST_PATH = os.path.join(BUILD_DIR, "manifest.json")
+
+FONDO = "h4.jpg"
+ANCHOS_FONDO = [640, 1024, 1600]
+LOGO = "UGR.png"
+ALTO_LOGO = 80
+DENSIDADES_LOGO = [1, 2, 3]
+CALIDAD = {"avif": 40, "webp": 60, "jpeg": 60}
+TIPOS_MIME = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+EXTENSIONES = {"avif": "avif", "webp": "webp", "jpeg": "jpg", "png": "png"}
+URL_CSS_RE = re.compile(r"""url\((['"]?)([^'")]+)\1\)""")
+
+def formatos_disponibles(base: str) -> list[str]:
+    formatos = ["avif"] if features.check("avif") else []
+    return formatos + ["webp", base]
+
+def _guardar_con_huella(datos: bytes, nombre: str, extension: str) -> str:
+    huella = hashlib.sha1(datos).hexdigest()[:10]
+    archivo = f"{nombre}.{huella}.{extension}"
+    with open(os.path.join(BUILD_DIR, archivo), "wb") as f:
+        f.write(datos)
+    return f"build/{archivo}"
+
+def _codificar(imagen: Image.Image, formato: str) -> bytes:
+    salida = BytesIO()
+    opciones = {"quality": CALIDAD[formato]} if formato in CALIDAD else {"optimize": True}
+    if formato == "jpeg":
+        opciones.update(optimize=True, progressive=True)
+        imagen = imagen.convert("RGB")
+    imagen.save(salida, format=formato.upper(), **opciones)
+    return salida.getvalue()
+
+def variantes_fondo() -> dict[int, dict[str, str]]:
+    """ {ancho: {formato: ruta en static}} """
+    original = Image.open(os.path.join(STATIC_DIR, FONDO)).convert("RGB")
+    nombre = os.path.splitext(FONDO)[0]
+    variantes = {}
+    for ancho in ANCHOS_FONDO:
+        ancho = min(ancho, original.width)
+        imagen = original.resize((ancho, round(original.height * ancho / original.width)), Image.LANCZOS)
+        variantes[ancho] = {f: _guardar_con_huella(_codificar(imagen, f), f"{nombre}-{ancho}", EXTENSIONES[f])
+                            for f in formatos_disponibles("jpeg")}
+    return variantes
+
+def variantes_logo() -> dict:
+    original = Image.open(os.path.join(STATIC_DIR, LOGO)).convert("RGBA")
+    nombre = os.path.splitext(LOGO)[0]
+    ancho_1x = round(original.width * ALTO_LOGO / original.height)
+    fuentes = {}
+    for formato in formatos_disponibles("png"):
+        fuentes[formato] = []
+        for densidad in DENSIDADES_LOGO:
+            alto = ALTO_LOGO * densidad
+            imagen = original.resize((round(original.width * alto / original.height), alto), Image.LANCZOS)
+            ruta = _guardar_con_huella(_codificar(imagen, formato), f"{nombre}-{alto}", EXTENSIONES[formato])
+            fuentes[formato].append([ruta, densidad])
+    return {"ancho": ancho_1x, "alto": ALTO_LOGO, "fuentes": fuentes,
+            "tipos": {f: TIPOS_MIME[f] for f in fuentes}}
+
+def _image_set(rutas: dict[str, str]) -> str:
+    # Las rutas son relativas a la hoja compilada, que está en la misma carpeta build/
+    partes = [f"url('{os.path.basename(ruta)}') type('{TIPOS_MIME[f]}')" for f, ruta in rutas.items()]
+    return f"image-set({', '.join(partes)})"
+
+def reescribir_urls(css: str, fondo: dict[int, dict[str, str]]) -> str:
+    """ La hoja compilada vive en build/: el fondo original pasa a apuntar a su JPEG más grande y el resto de rutas
+    relativas de static/ se corrigen con ../ """
+    mayor = os.path.basename(fondo[max(fondo)]["jpeg"])
+
+    def corregir(m):
+        ruta = m.group(2).strip()
+        if ruta == FONDO:
+            return f"url('{mayor}')"
+        if re.match(r"^(?:[a-z]+:|/|#)", ruta, re.IGNORECASE):
+            return m.group(0)
+        return f"url('../{ruta}')"
+    return URL_CSS_RE.sub(corregir, css)
+
+def css_fondo(variantes: dict[int, dict[str, str]]) -> str:
+    degradado = "linear-gradient(rgba(255, 255, 255, 0.88), rgba(255, 255, 255, 0.88))"
+    anchos = sorted(variantes)
+    bloques = ["\n/* ===== Generado por construir_estaticos.py: fondo responsive ===== */"]
+    for i, ancho in enumerate(reversed(anchos)):
+        rutas = variantes[ancho]
+        regla = (f"body {{\n"
+                 f"    background-image: {degradado}, url('{os.path.basename(rutas['jpeg'])}');\n"
+                 f"    background-image: {degradado}, {_image_set(rutas)};\n"
+                 f"}}")
+        if i == 0:
+            bloques.append(regla)
+        else:
+            indentada = "\n".join("  " + linea for linea in regla.splitlines())
+            bloques.append(f"@media (max-width: {ancho}px) {{\n{indentada}\n}}")
+    return "\n".join(bloques) + "\n"
+
+def main():
+    if os.path.isdir(BUILD_DIR):
+        shutil.rmtree(BUILD_DIR)
+    os.makedirs(BUILD_DIR)
+
+    fondo = variantes_fondo()
+    logo = variantes_logo()
+    with open(os.path.join(STATIC_DIR, "style.css"), "r", encoding="utf-8") as f:
+        css = f.read()
+    css = reescribir_urls(css, fondo)
+    hoja = _guardar_con_huella((css.rstrip("\n") + "\n" + css_fondo(fondo)).encode("utf-8"), "style", "css")
+
+    manifest = {"style.css": hoja, "logo": logo, "fondo": {str(a): v for a, v in fondo.items()}}
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+    original = os.path.getsize(os.path.join(STATIC_DIR, FONDO))
+    for ancho, rutas in sorted(fondo.items()):
+        tamanos = ", ".join(f"{f} {os.path.getsize(os.path.join(STATIC_DIR, r)) // 1024} KB" for f, r in rutas.items())
+        print(f"🖼 Fondo {ancho}px: {tamanos} (original {original // 1024} KB)")
+    print(f"✅ Estáticos compilados en {BUILD_DIR} (hoja {hoja})")
+
+if __name__ == "__main__":
+    main()
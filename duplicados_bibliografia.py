@@ -0,0 +1,205 @@
+""" Catálogo de referencias casi duplicadas en toda la bibliografía de la UGR.
+
+Cada referencia se normaliza con las mismas reglas que comparar.py (normalize_for_match: sin viñetas, acentos, URLs,
+años, ediciones ni editoriales/ciudades) y se resume en una firma MinHash sobre sus tokens. Con LSH por bandas solo se
+comparan las referencias que coinciden en alguna banda de la firma, así que el coste crece casi linealmente con el
+número de referencias en lugar de comparar todas contra todas. Las parejas candidatas se confirman con la similitud de
+Jaccard exacta de sus tokens y se agrupan (unión-búsqueda) en clusters: cada cluster es "el mismo libro" con todas sus
+variantes de escritura y las asignaturas y grados que lo citan.
+
+Por defecto lee el curso actual (BASE_NEW); si no existe, usa las comparativas (recursos sin cambios + añadidos).
+
+Uso: python duplicados_bibliografia.py [--curso BibliografiasUGR/grados/2025-2026] [--min-asignaturas 2]
+                                       [--umbral 0.8] [--bandas 8] [--filas 8] [--salida catalogo.json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+from collections import defaultdict
+from itertools import combinations
+from datetime import datetime
+
+import comparar
+from indice_carpetas import escanear_carpeta, split_degree_name_and_code_from_folder
+
+CATALOGO_PATH = os.path.join(comparar.BASE_DIR, "catalogo_referencias.json")
+PRIMO_MINHASH = (1 << 61) - 1
+MIN_LONGITUD_TOKEN = 3
+N_INFORME = 50
+
+# ====== Carga de las citas ======
+def cargar_citas(curso: str, comparativas: str) -> list[tuple[str, str, str, set]]:
+    """ [(codigo, asignatura, grado, recursos)] del curso indicado o, si no hay, de las comparativas. """
+    citas = []
+    idx = comparar.index_year_folder(curso)
+    if idx:
+        for codigo, (ruta, nombre_asig, nombre_grado) in sorted(idx.items()):
+            citas.append((codigo, nombre_asig, nombre_grado, comparar.leer_recursos_txt(ruta)))
+        return citas
+    for sub, info in sorted(escanear_carpeta(comparativas).items()):
+        nombre_grado, _ = split_degree_name_and_code_from_folder(sub)
+        for fn, nombre_asig, codigo in sorted(info["archivos"]):
+            if not codigo:
+                continue
+            secciones = comparar.leer_comparativa(os.path.join(comparativas, sub, fn))
+            citas.append((codigo, nombre_asig, nombre_grado, set(secciones["comunes"]) | set(secciones["anadidos"])))
+    return citas
+
+# ====== MinHash + LSH ======
+def tokens_referencia(normalizada: str) -> frozenset:
+    return frozenset(t for t in normalizada.split() if len(t) >= MIN_LONGITUD_TOKEN)
+
+def _hash_token(token: str) -> int:
+    # Hash estable entre ejecuciones (hash() de Python cambia con PYTHONHASHSEED)
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+def generar_permutaciones(n: int, semilla: int = 1) -> list[tuple[int, int]]:
+    rng = random.Random(semilla)
+    return [(rng.randrange(1, PRIMO_MINHASH), rng.randrange(0, PRIMO_MINHASH)) for _ in range(n)]
+
+def firmas_minhash(conjuntos: list[frozenset], permutaciones: list[tuple[int, int]]) -> list[tuple[int, ...]]:
+    """ Firma MinHash de cada conjunto de tokens. Los valores permutados se calculan una vez por token distinto, y la
+    firma de una referencia es el mínimo elemento a elemento de los vectores de sus tokens. """
+    vectores = {}
+    firmas = []
+    for tokens in conjuntos:
+        for t in tokens:
+            if t not in vectores:
+                h = _hash_token(t)
+                vectores[t] = tuple((a * h + b) % PRIMO_MINHASH for a, b in permutaciones)
+        firmas.append(tuple(map(min, zip(*(vectores[t] for t in tokens)))))
+    return firmas
+
+def parejas_candidatas(firmas: list[tuple[int, ...]], bandas: int, filas: int):
+    """ Recorre los cubos LSH: dos referencias son candidatas si coinciden en todas las filas de alguna banda. Dentro de
+    cada cubo se proponen todas las parejas: si el primer miembro es un falso positivo de LSH, los demás tienen que poder
+    compararse entre sí (los cubos son pequeños y las parejas ya unidas no se vuelven a comparar). """
+    for banda in range(bandas):
+        cubos = defaultdict(list)
+        desde, hasta = banda * filas, (banda + 1) * filas
+        for i, firma in enumerate(firmas):
+            cubos[firma[desde:hasta]].append(i)
+        for miembros in cubos.values():
+            yield from combinations(miembros, 2)
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _raiz(padres: list[int], i: int) -> int:
+    while padres[i] != i:
+        padres[i] = padres[padres[i]]
+        i = padres[i]
+    return i
+
+def agrupar_casi_duplicados(conjuntos: list[frozenset], umbral: float, bandas: int, filas: int,
+                            semilla: int = 1) -> list[int]:
+    """ Devuelve para cada conjunto el índice del representante de su cluster. """
+    firmas = firmas_minhash(conjuntos, generar_permutaciones(bandas * filas, semilla))
+    padres = list(range(len(conjuntos)))
+    for i, j in parejas_candidatas(firmas, bandas, filas):
+        ri, rj = _raiz(padres, i), _raiz(padres, j)
+        if ri != rj and jaccard(conjuntos[i], conjuntos[j]) >= umbral:
+            padres[max(ri, rj)] = min(ri, rj)
+    return [_raiz(padres, i) for i in range(len(conjuntos))]
+
+# ====== Catálogo ======
+def construir_catalogo(citas: list[tuple[str, str, str, set]], umbral: float, bandas: int, filas: int,
+                       min_asignaturas: int) -> list[dict]:
+    # Primero se agrupan las referencias con la misma forma normalizada (duplicados exactos tras normalizar)
+    por_norma = defaultdict(lambda: defaultdict(set))  # norma -> texto original -> {códigos}
+    asignaturas = {}
+    for codigo, nombre_asig, nombre_grado, recursos in citas:
+        asignaturas[codigo] = (nombre_asig, nombre_grado)
+        for ref in recursos:
+            norma = comparar.normalize_for_match(ref)
+            if tokens_referencia(norma):
+                por_norma[norma][ref].add(codigo)
+
+    normas = sorted(por_norma)
+    conjuntos = [tokens_referencia(n) for n in normas]
+    representantes = agrupar_casi_duplicados(conjuntos, umbral, bandas, filas)
+
+    clusters = defaultdict(list)
+    for norma, rep in zip(normas, representantes):
+        clusters[rep].append(norma)
+
+    catalogo = []
+    for miembros in clusters.values():
+        variantes = defaultdict(set)
+        for norma in miembros:
+            for texto, codigos in por_norma[norma].items():
+                variantes[texto] |= codigos
+        codigos = set().union(*variantes.values())
+        if len(codigos) < min_asignaturas:
+            continue
+        ordenadas = sorted(variantes.items(), key=lambda kv: (-len(kv[1]), kv[0]))
+        catalogo.append({
+            "referencia": ordenadas[0][0],
+            "n_asignaturas": len(codigos),
+            "n_grados": len({asignaturas[c][1] for c in codigos}),
+            "variantes": [{"texto": texto, "n_asignaturas": len(cods)} for texto, cods in ordenadas],
+            "asignaturas": [{"codigo": c, "asignatura": asignaturas[c][0], "grado": asignaturas[c][1]}
+                            for c in sorted(codigos)],
+        })
+    catalogo.sort(key=lambda c: (-c["n_asignaturas"], -len(c["variantes"]), c["referencia"]))
+    for n, cluster in enumerate(catalogo, 1):
+        cluster["id"] = n
+    return catalogo
+
+def escribir_informe(ruta: str, catalogo: list[dict], total_referencias: int, total_asignaturas: int):
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("📚 Referencias citadas en varias asignaturas (casi duplicados agrupados):\n")
+        f.write("=" * 40 + "\n")
+        f.write(f"Asignaturas analizadas: {total_asignaturas}\n")
+        f.write(f"Referencias distintas (normalizadas): {total_referencias}\n")
+        f.write(f"Clusters en el catálogo: {len(catalogo)}\n")
+        f.write(f"Clusters con variantes de escritura: {sum(1 for c in catalogo if len(c['variantes']) > 1)}\n\n")
+        for cluster in catalogo[:N_INFORME]:
+            f.write(f"#{cluster['id']} · {cluster['n_asignaturas']} asignaturas en {cluster['n_grados']} grados · "
+                    f"{len(cluster['variantes'])} variante(s)\n")
+            f.write(f"   {cluster['referencia']}\n")
+            for variante in cluster["variantes"][1:4]:
+                f.write(f"   ≈ {variante['texto']}\n")
+            f.write("\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agrupa referencias casi duplicadas con MinHash/LSH")
+    parser.add_argument("--curso", default=comparar.BASE_NEW, help="Carpeta del curso a analizar")
+    parser.add_argument("--comparativas", default=comparar.COMPARATIVAS_BASE,
+                        help="Comparativas a usar si no existe la carpeta del curso")
+    parser.add_argument("--umbral", type=float, default=0.8, help="Jaccard mínimo de tokens para unir dos referencias")
+    parser.add_argument("--bandas", type=int, default=8, help="Bandas LSH")
+    parser.add_argument("--filas", type=int, default=8, help="Filas (hashes) por banda")
+    parser.add_argument("--min-asignaturas", type=int, default=2,
+                        help="Solo se guardan los clusters citados por al menos este número de asignaturas")
+    parser.add_argument("--salida", default=CATALOGO_PATH, help="JSON del catálogo (junto a él se escribe un .txt)")
+    args = parser.parse_args(argv)
+
+    print("📁 Leyendo bibliografías…")
+    citas = cargar_citas(args.curso, args.comparativas)
+    if not citas:
+        print(f"❗ No hay bibliografías en {args.curso} ni comparativas en {args.comparativas}")
+        return
+    print(f" → {len(citas)} asignaturas, {sum(len(r) for *_, r in citas)} citas")
+
+    print("🔎 Agrupando casi duplicados (MinHash/LSH)…")
+    catalogo = construir_catalogo(citas, args.umbral, args.bandas, args.filas, args.min_asignaturas)
+    total_referencias = len({comparar.normalize_for_match(r) for *_, recursos in citas for r in recursos})
+
+    os.makedirs(os.path.dirname(args.salida) or ".", exist_ok=True)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump({"generado": datetime.now().isoformat(timespec="seconds"),
+                   "parametros": {"umbral": args.umbral, "bandas": args.bandas, "filas": args.filas,
+                                  "min_asignaturas": args.min_asignaturas},
+                   "clusters": catalogo}, f, ensure_ascii=False, indent=1)
+    informe = os.path.splitext(args.salida)[0] + ".txt"
+    escribir_informe(informe, catalogo, total_referencias, len(citas))
+    print(f"✅ {len(catalogo)} clusters → {args.salida} (resumen en {informe})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+""" Ejecuta en un proceso aparte un trabajo lanzado desde app.py: extracción de guías (extraer_bibliografia_toda_ugr)
+o generación de comparativas (comparar).
+
+app.py no los ejecuta en su propio proceso porque comparar.main crea un ProcessPoolExecutor con fork, y hacer fork de
+un servidor con hilos (y conexiones SQLite abiertas en ellos) puede heredar locks tomados. El progreso llega a app.py
+por un descriptor heredado: una línea JSON {"porcentaje", "etiqueta"} por cada llamada al callback y, al final,
+{"resultado"}. Los print de los scripts salen por la consola del servidor como siempre.
+
+Uso: python ejecutar_trabajo.py <extraer|comparar> <descriptor>
+"""
+
+import argparse
+import asyncio
+import json
+import os
+
+def _extraer(callback):
+    import extraer_bibliografia_toda_ugr
+    return asyncio.run(extraer_bibliografia_toda_ugr.main(callback))
+
+def _comparar(callback):
+    import comparar
+    # app.py actualiza el índice de búsqueda en segundo plano al terminar el trabajo
+    return comparar.main(["--sin-busqueda"], callback)
+
+TRABAJOS = {"extraer": _extraer, "comparar": _comparar}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta un trabajo de app.py y publica su progreso por un descriptor")
+    parser.add_argument("tipo", choices=sorted(TRABAJOS), help="Trabajo a ejecutar")
+    parser.add_argument("descriptor", type=int, help="Descriptor (heredado) en el que escribir el progreso")
+    args = parser.parse_args(argv)
+
+    with os.fdopen(args.descriptor, "w", encoding="utf-8", buffering=1) as canal:
+        def callback(porcentaje, etiqueta):
+            canal.write(json.dumps({"porcentaje": porcentaje, "etiqueta": etiqueta}, ensure_ascii=False) + "\n")
+
+        resultado = TRABAJOS[args.tipo](callback)
+        canal.write(json.dumps({"resultado": resultado if isinstance(resultado, dict) else None},
+                               ensure_ascii=False, default=str) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,8 @@ import pdfplumber
 import re
 import unicodedata
 from urllib.parse import urlparse, urljoin
+from indice_carpetas import escanear_carpeta
+import buscador
 from aiohttp import (
     ClientError, ClientPayloadError, ClientConnectorError,
     ClientSession, ClientTimeout
@@ -363,5 +365,9 @@ async def main():
             ]
             await asyncio.gather(*tareas)
 
+    # Deja actualizado el índice de la carpeta del curso para que comparar.py/app.py no tengan que reescanearla
+    escanear_carpeta(BASE_PATH)
+    buscador.actualizar_indice([BASE_PATH])
+
 if __name__ == "__main__":
     asyncio.run(main())
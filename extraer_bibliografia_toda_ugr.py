@@ -221,8 +221,10 @@ async def procesar_url(session, base_url):
             fecha_nueva = obtener_fecha_archivo(ruta_nueva)
             comparativa, porcentaje_cambio = comparar_bibliografias(antigua, bibliografia, fecha_antigua, fecha_nueva)
 
-            with open(ruta_comparativa, "w", encoding="utf-8") as f:
+            # .tmp + rename: la web puede estar leyendo la comparativa mientras se reescribe
+            with open(ruta_comparativa + ".tmp", "w", encoding="utf-8") as f:
                 f.write(comparativa)
+            os.replace(ruta_comparativa + ".tmp", ruta_comparativa)
 
             if porcentaje_cambio >= 1.0:
                 asignaturas_por_cambio["100%"].append(nombre_asignatura)
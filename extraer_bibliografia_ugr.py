@@ -1,10 +1,27 @@
+""" Compara la bibliografía de una guía docente con la lista de lecturas exportada de Leganto (PDF o HTML).
+
+Uso individual: python extraer_bibliografia_ugr.py <url_guia_docente> <archivo_pdf>
+Uso por lotes:  python extraer_bibliografia_ugr.py --lote <carpeta_exportaciones_leganto> [--guias <carpeta_curso>]
+                [--salida <informe>] [--workers N]
+
+En el modo por lotes cada exportación (.pdf/.html) se empareja por código de asignatura con el .txt de la guía del
+corpus local (por defecto el curso actual de comparar.py), los pares se procesan en paralelo y se genera un único
+informe de cobertura (.txt y .json) para auditar de una vez todas las listas de una biblioteca.
+"""
+
 import re
 import sys
 import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 import requests
 from bs4 import BeautifulSoup
 from PyPDF2 import PdfReader
-from difflib import SequenceMatcher
+
+import comparar
+from indice_carpetas import split_name_and_code_from_filename
 
 def descargar_html(url):
     try:
@@ -27,6 +44,31 @@ def extraer_codigo_asignatura(html):
     match = re.search(r"\b\d{5}[A-Z]\d\b", texto)
     return match.group(0) if match else None
 
+def separar_autor_titulo(texto):
+    if ":" in texto:
+        partes = texto.split(":", 1)
+    elif ";" in texto:
+        partes = texto.split(";", 1)
+    elif "." in texto:
+        partes = texto.split(".", 1)
+    else:
+        partes = [None, texto]
+
+    autor = partes[0].strip() if partes[0] else ""
+    titulo = partes[1].strip() if len(partes) > 1 else partes[0].strip()
+    return {"autor": autor, "titulo": titulo}
+
+def entrada_desde_referencia(ref):
+    """ {"autor", "titulo"} de una referencia del corpus local (.txt). Si sigue el esquema "Autor (año). Título. ..."
+    el título es lo que va tras el año hasta el primer punto; si no, se corta igual que en la guía web. """
+    ref = comparar.strip_bullets_and_punct(ref)
+    anio = comparar.ANIO_PARENTESIS_RE.search(ref)
+    if anio:
+        titulo = re.split(r"\.(?:\s|$)", ref[anio.end():].strip(" ."), 1)[0].strip()
+        if titulo:
+            return {"autor": ref[:anio.start()].strip(" ,"), "titulo": titulo}
+    return separar_autor_titulo(ref)
+
 def extraer_bibliografia(html):
     soup = BeautifulSoup(html, "html.parser")
     bibliografia = []
@@ -55,22 +97,9 @@ def extraer_bibliografia(html):
                 for el in elementos:
                     texto = el.get_text(separator=" ", strip=True)
                     if texto:
-                        if ":" in texto:
-                            partes = texto.split(":", 1)
-                        elif ";" in texto:
-                            partes = texto.split(";", 1)
-                        elif "." in texto:
-                            partes = texto.split(".", 1)
-                        else:
-                            partes = [None, texto]
-
-                        autor = partes[0].strip() if partes[0] else ""
-                        titulo = partes[1].strip() if len(partes) > 1 else partes[0].strip()
-                        if titulo:
-                            bibliografia.append({
-                                "autor": autor,
-                                "titulo": titulo
-                            })
+                        entrada = separar_autor_titulo(texto)
+                        if entrada["titulo"]:
+                            bibliografia.append(entrada)
 
         else:
             print(f"⚠️ No se encontró sección con <h3> {encabezado}")
@@ -80,15 +109,12 @@ def extraer_bibliografia(html):
 def extraer_texto_pdf(nombre_pdf):
     try:
         lector = PdfReader(nombre_pdf)
-        texto = ""
-        for pagina in lector.pages:
-            texto += pagina.extract_text() + "\n"
-        return texto
+        return "".join((pagina.extract_text() or "") + "\n" for pagina in lector.pages)
     except Exception as e:
         print(f"❌ Error al leer el PDF: {e}")
         return ""
 
-def extraer_titulos_pdf(texto_pdf):
+def extraer_titulos_pdf(texto_pdf, mostrar=True):
     lineas = texto_pdf.split("\n")
     titulos = []
     siguiente_es_titulo = False
@@ -101,18 +127,37 @@ def extraer_titulos_pdf(texto_pdf):
         if "ir al ejemplar" in l.lower() or "ir a la sección" in l.lower():
             siguiente_es_titulo = True
 
-    print(f"✅ Títulos detectados: {len(titulos)}")
-    for i, t in enumerate(titulos, 1):
-        print(f"{i}. {t}")
+    if mostrar:
+        print(f"✅ Títulos detectados: {len(titulos)}")
+        for i, t in enumerate(titulos, 1):
+            print(f"{i}. {t}")
     return titulos
 
+def extraer_titulos_html(html):
+    """ Títulos de una exportación HTML de Leganto: los elementos cuya clase contiene "title" dentro de cada cita; si
+    la exportación no los marca, se usa el texto plano con la misma regla que en el PDF. """
+    soup = BeautifulSoup(html, "html.parser")
+    titulos = [el.get_text(" ", strip=True) for el in soup.find_all(class_=re.compile(r"title", re.IGNORECASE))
+               if el.name not in ("title", "h1")]
+    titulos = [t for t in titulos if t]
+    return titulos or extraer_titulos_pdf(soup.get_text("\n"), mostrar=False)
+
+def extraer_titulos_exportacion(ruta):
+    if ruta.lower().endswith(".pdf"):
+        return extraer_titulos_pdf(extraer_texto_pdf(ruta), mostrar=False)
+    with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+        return extraer_titulos_html(f.read())
+
 def normalizar_titulo_comparacion(texto):
     texto = texto.lower()
     texto = re.sub(r"[.,:;!?()\"\'-]", " ", texto)
     texto = re.sub(r"\s+", " ", texto)
     return texto.strip()
 
-def comparar_por_titulos(guia, pdf_titulos, codigo_asignatura, umbral_fuzzy=0.55):
+def emparejar_titulos(guia, pdf_titulos, umbral_fuzzy=0.55):
+    """ Coincidencias exactas (título normalizado) y aproximadas entre la guía y Leganto. Para cada título de la guía
+    sin pareja exacta se toma el primer título de Leganto (en orden alfabético) con parecido >= umbral_fuzzy; en vez de
+    probar todos contra todos se usa el índice de trigramas de comparar.py, que da exactamente el mismo resultado. """
     guia_map = {
         normalizar_titulo_comparacion(entry["titulo"]): (entry["titulo"], entry["autor"])
         for entry in guia
@@ -127,18 +172,33 @@ def comparar_por_titulos(guia, pdf_titulos, codigo_asignatura, umbral_fuzzy=0.55
     solo_pdf = titulos_pdf_norm - comunes
 
     fuzzy_matches = []
-    for g in sorted(solo_guia):
-        for p in sorted(solo_pdf):
-            ratio = SequenceMatcher(None, g, p).ratio()
-            if ratio >= umbral_fuzzy:
+    candidatos_pdf = sorted(solo_pdf)
+    if candidatos_pdf:
+        indice = comparar.indice_ngramas(candidatos_pdf)
+        for g in sorted(solo_guia):
+            pos = comparar.primer_match_indexado(g, indice, umbral_fuzzy)
+            if pos is not None:
+                p = candidatos_pdf[pos]
+                ratio = comparar.ratio_catalogado(g, p)
                 fuzzy_matches.append((guia_map[g][0], guia_map[g][1], pdf_map[p], round(ratio * 100, 2)))
-                break
 
     matched_guia = set(normalizar_titulo_comparacion(g) for g, _, _, _ in fuzzy_matches)
     matched_pdf = set(normalizar_titulo_comparacion(p) for _, _, p, _ in fuzzy_matches)
     final_solo_guia = [g for g in solo_guia if g not in matched_guia]
     final_solo_pdf = [p for p in solo_pdf if p not in matched_pdf]
 
+    total = len(comunes) + len(fuzzy_matches) + len(final_solo_guia) + len(final_solo_pdf)
+    coincidencia = round((len(comunes) + len(fuzzy_matches)) / total * 100, 2) if total > 0 else 0.0
+    return {
+        "guia_map": guia_map, "pdf_map": pdf_map, "comunes": comunes, "fuzzy": fuzzy_matches,
+        "solo_guia": final_solo_guia, "solo_pdf": final_solo_pdf, "coincidencia": coincidencia,
+    }
+
+def comparar_por_titulos(guia, pdf_titulos, codigo_asignatura, umbral_fuzzy=0.55):
+    r = emparejar_titulos(guia, pdf_titulos, umbral_fuzzy)
+    guia_map, pdf_map, comunes, fuzzy_matches = r["guia_map"], r["pdf_map"], r["comunes"], r["fuzzy"]
+    final_solo_guia, final_solo_pdf = r["solo_guia"], r["solo_pdf"]
+
     nombre_archivo = f"comparativa_{codigo_asignatura}.txt"
     with open(nombre_archivo, "w", encoding="utf-8") as f:
         f.write("📘 TÍTULOS COINCIDENTES EXACTOS:\n")
@@ -161,22 +221,160 @@ def comparar_por_titulos(guia, pdf_titulos, codigo_asignatura, umbral_fuzzy=0.55
             f.write(f"   📘 Título: {pdf_map[key]}\n")
 
         f.write("\n📊 RESUMEN:\n")
-        total = len(comunes) + len(fuzzy_matches) + len(final_solo_guia) + len(final_solo_pdf)
-        coincidencia = round((len(comunes) + len(fuzzy_matches)) / total * 100, 2) if total > 0 else 0.0
         f.write(f"   Coincidencia exacta: {len(comunes)} títulos\n")
         f.write(f"   Coincidencia fuzzy: {len(fuzzy_matches)} títulos\n")
-        f.write(f"   Porcentaje de coincidencia total: {coincidencia}%\n")
+        f.write(f"   Porcentaje de coincidencia total: {r['coincidencia']}%\n")
 
     print(f"\n✅ Comparativa guardada en: {nombre_archivo}")
 
+# ----------- MODO POR LOTES ------------
+EXTENSIONES_LEGANTO = (".pdf", ".html", ".htm")
+
+def listar_exportaciones(carpeta):
+    return sorted(os.path.join(raiz, fn) for raiz, _, archivos in os.walk(carpeta)
+                  for fn in archivos if fn.lower().endswith(EXTENSIONES_LEGANTO))
+
+def codigo_de_exportacion(ruta, codigos_conocidos):
+    """ Código de asignatura de una exportación: el del nombre del archivo (mismo criterio que los .txt del corpus) o,
+    si el nombre no lo lleva, el primer código conocido que aparezca en el texto exportado. """
+    _, codigo = split_name_and_code_from_filename(ruta)
+    if codigo in codigos_conocidos:
+        return codigo
+    if ruta.lower().endswith(".pdf"):
+        texto = extraer_texto_pdf(ruta) or ""
+    else:
+        with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+            texto = BeautifulSoup(f.read(), "html.parser").get_text(" ")
+    for candidato in re.findall(r"[A-Za-z0-9]{3,}", texto):
+        if candidato in codigos_conocidos:
+            return candidato
+    return None
+
+def reconciliar_par(par):
+    """ Trabajo de un proceso: lee la guía (.txt del corpus) y la exportación de Leganto y devuelve sus cifras. """
+    codigo, ruta_guia, nombre_asig, nombre_grado, ruta_exportacion = par
+    guia = [entrada_desde_referencia(ref) for ref in sorted(comparar.leer_recursos_txt(ruta_guia))]
+    guia = [e for e in guia if e["titulo"]]
+    titulos = extraer_titulos_exportacion(ruta_exportacion)
+    r = emparejar_titulos(guia, titulos)
+    n_guia = len(r["guia_map"])
+    emparejados_guia = n_guia - len(r["solo_guia"])
+    return {
+        "codigo": codigo,
+        "asignatura": nombre_asig,
+        "grado": nombre_grado,
+        "exportacion": ruta_exportacion,
+        "titulos_guia": n_guia,
+        "titulos_leganto": len(r["pdf_map"]),
+        "exactos": len(r["comunes"]),
+        "aproximados": len(r["fuzzy"]),
+        "solo_guia": sorted(r["guia_map"][g][0] for g in r["solo_guia"]),
+        "solo_leganto": sorted(r["pdf_map"][p] for p in r["solo_pdf"]),
+        "coincidencia": r["coincidencia"],
+        "cobertura_guia": round(emparejados_guia / n_guia * 100, 2) if n_guia else 0.0,
+    }
+
+def exportaciones_repetidas(resultados):
+    """ {código: [exportaciones]} de las asignaturas que tienen más de una exportación en el lote. """
+    por_codigo = {}
+    for r in resultados:
+        por_codigo.setdefault(r["codigo"], []).append(r["exportacion"])
+    return {codigo: sorted(rutas) for codigo, rutas in sorted(por_codigo.items()) if len(rutas) > 1}
+
+def escribir_informe_lote(ruta_txt, resultados, sin_pareja, carpeta):
+    repetidas = exportaciones_repetidas(resultados)
+    with open(ruta_txt, "w", encoding="utf-8") as f:
+        f.write(f"📚 Reconciliación guías docentes ↔ Leganto ({carpeta})\n")
+        f.write("=" * 40 + "\n")
+        f.write(f"Asignaturas reconciliadas: {len({r['codigo'] for r in resultados})} "
+                f"({len(resultados)} exportaciones)\n")
+        f.write(f"Asignaturas con varias exportaciones: {len(repetidas)}\n")
+        f.write(f"Exportaciones sin asignatura: {len(sin_pareja)}\n")
+        if resultados:
+            media = round(sum(r["cobertura_guia"] for r in resultados) / len(resultados), 2)
+            f.write(f"Cobertura media de la guía en Leganto: {media}%\n")
+        f.write("\n📊 Por asignatura (de menor a mayor cobertura):\n")
+        for r in resultados:
+            f.write(f"   {r['codigo']} · {r['asignatura']} ({r['grado']}): cobertura {r['cobertura_guia']}% · "
+                    f"coincidencia {r['coincidencia']}% · guía {r['titulos_guia']} · Leganto {r['titulos_leganto']} · "
+                    f"exactos {r['exactos']} · aproximados {r['aproximados']} · "
+                    f"{os.path.basename(r['exportacion'])}\n")
+            for titulo in r["solo_guia"]:
+                f.write(f"      📗 Solo en la guía: {titulo}\n")
+            for titulo in r["solo_leganto"]:
+                f.write(f"      📕 Solo en Leganto: {titulo}\n")
+        if repetidas:
+            f.write("\n🔁 Asignaturas con varias exportaciones (cada una se reconcilia por separado):\n")
+            for codigo, rutas in repetidas.items():
+                f.write(f"   {codigo}:\n")
+                for ruta in rutas:
+                    f.write(f"      {ruta}\n")
+        if sin_pareja:
+            f.write("\n❗ Exportaciones sin asignatura reconocida:\n")
+            for ruta in sin_pareja:
+                f.write(f"   {ruta}\n")
+
+def reconciliar_lote(carpeta, guias, salida=None, workers=None):
+    exportaciones = listar_exportaciones(carpeta)
+    if not exportaciones:
+        print(f"❌ No hay exportaciones de Leganto (.pdf/.html) en {carpeta}")
+        return None
+    idx = comparar.index_year_folder(guias)
+    if not idx:
+        print(f"❌ No hay guías docentes (.txt) en {guias}")
+        return None
+
+    print(f"📄 {len(exportaciones)} exportaciones de Leganto, {len(idx)} guías en {guias}")
+    # Una asignatura puede tener varias exportaciones (p. ej. una lista por grupo): se reconcilian todas y los resultados
+    # se distinguen por la ruta de la exportación
+    pares, sin_pareja = [], []
+    for ruta in exportaciones:
+        codigo = codigo_de_exportacion(ruta, idx)
+        if codigo is None:
+            sin_pareja.append(ruta)
+            continue
+        ruta_guia, nombre_asig, nombre_grado = idx[codigo]
+        pares.append((codigo, ruta_guia, nombre_asig, nombre_grado, ruta))
+
+    print(f"🔎 Reconciliando {len(pares)} exportaciones…")
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        resultados = list(ex.map(reconciliar_par, pares, chunksize=max(1, len(pares) // 64)))
+    resultados.sort(key=lambda r: (r["cobertura_guia"], r["codigo"], r["exportacion"]))
+
+    if salida is None:
+        salida = f"informe_leganto_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    escribir_informe_lote(salida, resultados, sin_pareja, carpeta)
+    ruta_json = os.path.splitext(salida)[0] + ".json"
+    with open(ruta_json, "w", encoding="utf-8") as f:
+        json.dump({"generado": datetime.now().isoformat(timespec="seconds"), "exportaciones": carpeta,
+                   "guias": guias, "asignaturas": resultados, "varias_exportaciones": exportaciones_repetidas(resultados),
+                   "sin_asignatura": sin_pareja},
+                  f, ensure_ascii=False, indent=1)
+    print(f"✅ Informe consolidado en: {salida} (datos en {ruta_json})")
+    return resultados
+
 # ----------- EJECUCIÓN ------------
-if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("❌ Uso: python script.py <url_guia_docente> <archivo_pdf>")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara guías docentes con las listas de lecturas de Leganto")
+    parser.add_argument("url_guia", nargs="?", help="URL de la guía docente (modo individual)")
+    parser.add_argument("archivo_pdf", nargs="?", help="PDF exportado de Leganto (modo individual)")
+    parser.add_argument("--lote", metavar="CARPETA", help="Carpeta con exportaciones de Leganto (.pdf/.html)")
+    parser.add_argument("--guias", default=comparar.BASE_NEW, help="Carpeta del curso con las guías (.txt)")
+    parser.add_argument("--salida", help="Informe consolidado .txt (junto a él se escribe un .json)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto, todos los núcleos)")
+    args = parser.parse_args(argv)
+
+    if args.lote:
+        if reconciliar_lote(args.lote, args.guias, args.salida, args.workers) is None:
+            sys.exit(1)
+        return
+
+    if not args.url_guia or not args.archivo_pdf:
+        print("❌ Uso: python script.py <url_guia_docente> <archivo_pdf>  |  --lote <carpeta_exportaciones>")
         sys.exit(1)
 
-    url_guia = sys.argv[1]
-    archivo_pdf = sys.argv[2]
+    url_guia = args.url_guia
+    archivo_pdf = args.archivo_pdf
 
     if not os.path.exists(archivo_pdf):
         print(f"❌ No se encuentra el archivo PDF: {archivo_pdf}")
@@ -198,3 +396,6 @@ if __name__ == "__main__":
 
     print("\n🔎 Comparando títulos (exactos y aproximados)...")
     comparar_por_titulos(bib_guia, titulos_pdf, codigo)
+
+if __name__ == "__main__":
+    main()
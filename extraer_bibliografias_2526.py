@@ -6,6 +6,8 @@ import os
 import re
 import pandas as pd
 from itertools import islice
+from indice_carpetas import escanear_carpeta
+import buscador
 
 ''' A continuación se muestran los enlaces que redirigen a distintas páginas dentro de https://www.ugr.es/sitemap,
 en concreto de la 8 a la 11 que son las páginas donde se encuentran los enlaces de las páginas de las diferentes 
@@ -357,5 +359,9 @@ async def main():
             tareas = [procesar_url(session, url) for url in grupo]
             await asyncio.gather(*tareas)
 
+    # Deja actualizado el índice de la carpeta del curso para que comparar.py/app.py no tengan que reescanearla
+    escanear_carpeta(GRADOS_PATH)
+    buscador.actualizar_indice([GRADOS_PATH])
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,115 @@
+""" Índice persistente de las carpetas de BibliografiasUGR/grados (un curso como 2025-2026, o Comparativas).
+Cada carpeta de grado se escanea con os.scandir y el resultado se guarda en <carpeta raíz>/.indice_carpeta.json junto con
+el mtime y el tamaño del directorio del grado: en la siguiente ejecución solo se vuelven a escanear los grados cuyo
+directorio ha cambiado (se han creado, borrado o renombrado archivos). Lo usan comparar.py, app.py y los extractores,
+así que ninguna herramienta vuelve a recorrer todo el árbol al arrancar.
+"""
+
+import os
+import re
+import json
+
+CACHE_NOMBRE = ".indice_carpeta.json"
+CACHE_VERSION = 1
+
+# Copia en memoria por carpeta raíz (ruta absoluta), para no releer el JSON en cada llamada del mismo proceso
+_memoria: dict[str, dict] = {}
+
+# ====== Extraer nombre/código de asignatura ======
+def split_name_and_code_from_filename(filename: str) -> tuple[str, str | None]:
+    base = os.path.splitext(os.path.basename(filename))[0]
+    matches = list(re.finditer(r"[A-Za-z0-9]{3,}", base))
+    if not matches:
+        return base.strip(), None
+    last = matches[-1]
+    code = last.group(0)
+    name = (base[:last.start()] + base[last.end():]).strip()
+    name = re.sub(r"[\s\-_()]+$", "", name)
+    name = re.sub(r"^[\s\-_()]+", "", name)
+    name = re.sub(r"\s{2,}", " ", name).strip()
+    return (name or base).strip(), code
+
+# ====== Extraer nombre de grado y código desde carpeta ======
+def split_degree_name_and_code_from_folder(folder_name: str) -> tuple[str, str]:
+    raw = folder_name.strip()
+    parts = re.split(r"[-_]", raw)
+    if parts and re.fullmatch(r"[A-Za-z0-9]{3,}", parts[-1]):
+        cod3 = parts[-1][:3]
+        nombre = re.sub(r"[-_]*" + re.escape(parts[-1]) + r"$", "", raw).strip("-_")
+        if nombre.startswith("grado-"):
+            nombre = nombre[6:]
+        nombre = nombre or raw
+        return nombre, cod3
+    name = raw[6:] if raw.startswith("grado-") else raw
+    return name or "desconocido", "000"
+
+# ====== Caché en disco ======
+def _cargar_cache(root: str) -> dict:
+    if os.path.abspath(root) in _memoria:
+        return _memoria[os.path.abspath(root)]
+    try:
+        with open(os.path.join(root, CACHE_NOMBRE), "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        if datos.get("version") == CACHE_VERSION:
+            return datos.get("grados", {})
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {}
+
+def _guardar_cache(root: str, grados: dict):
+    ruta = os.path.join(root, CACHE_NOMBRE)
+    tmp = ruta + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "grados": grados}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, ruta)
+    except OSError:
+        pass  # carpeta de solo lectura: el índice sigue valiendo en memoria
+
+def _escanear_grado(entrada: os.DirEntry, st: os.stat_result) -> dict:
+    grado_nombre, _ = split_degree_name_and_code_from_folder(entrada.name)
+    archivos = []
+    with os.scandir(entrada.path) as it:
+        for fe in it:
+            if not fe.name.endswith(".txt"):
+                continue
+            nombre_asig, codigo = split_name_and_code_from_filename(fe.name)
+            archivos.append([fe.name, nombre_asig, codigo])
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "grado_nombre": grado_nombre, "archivos": archivos}
+
+def escanear_carpeta(root: str) -> dict[str, dict]:
+    """
+    Devuelve {subcarpeta de grado: {"grado_nombre", "archivos": [[archivo .txt, nombre_asig, codigo], ...], ...}}
+    en el orden en que os.scandir devuelve las subcarpetas. Solo se reescanean los grados cuyo directorio cambió.
+    """
+    if not os.path.isdir(root):
+        return {}
+    previo = _cargar_cache(root)
+    grados = {}
+    cambios = False
+    with os.scandir(root) as it:
+        for entrada in it:
+            if not entrada.is_dir():
+                continue
+            st = entrada.stat()
+            cacheado = previo.get(entrada.name)
+            if cacheado and cacheado.get("mtime_ns") == st.st_mtime_ns and cacheado.get("size") == st.st_size:
+                grados[entrada.name] = cacheado
+            else:
+                grados[entrada.name] = _escanear_grado(entrada, st)
+                cambios = True
+    if cambios or set(grados) != set(previo):
+        _guardar_cache(root, grados)
+    _memoria[os.path.abspath(root)] = grados
+    return grados
+
+def index_year_folder(root: str) -> dict[str, tuple[str, str, str]]:
+    """ codigo -> (ruta del .txt, nombre de la asignatura, nombre del grado), como lo espera comparar.py """
+    idx = {}
+    for sub, info in escanear_carpeta(root).items():
+        subdir = os.path.join(root, sub)
+        for fn, nombre_asig, codigo in info["archivos"]:
+            if not codigo:
+                continue
+            idx[codigo] = (os.path.join(subdir, fn), nombre_asig, info["grado_nombre"])
+    return idx
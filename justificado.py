@@ -0,0 +1,70 @@
+""" Justificado de texto a ancho fijo (monoespaciado). comparar.py ya no justifica las comparativas al escribirlas
+(guarda un recurso por línea); app.py lo aplica al mostrar una asignatura si el usuario lo pide.
+"""
+
+import re
+import textwrap
+
+# Indica el ancho del justificado
+JUSTIFY_WIDTH = 100
+
+def justify_line(line: str, width: int) -> str:
+    words = line.split()
+    if not words: return ""
+    if len(words) == 1: return words[0]
+    text_len = sum(len(w) for w in words)
+    total_spaces = width - text_len
+    if total_spaces <= len(words) - 1:
+        return " ".join(words)
+    gaps = len(words) - 1
+    base = total_spaces // gaps
+    extra = total_spaces % gaps
+    parts = []
+    for i, w in enumerate(words[:-1]):
+        pads = 1 + base + (1 if i < extra else 0)
+        parts.append(w + " " * pads)
+    parts.append(words[-1])
+    return "".join(parts)
+
+def justify_text(text: str, width: int) -> str:
+    if not text: return ""
+    # Sin partir palabras largas ni guiones: las URL tienen que seguir enteras para poder enlazarlas
+    wrapped = textwrap.wrap(text, width=width, break_long_words=False, break_on_hyphens=False)
+    if not wrapped: return ""
+    lines = []
+    for i, ln in enumerate(wrapped):
+        lines.append(ln if i == len(wrapped) - 1 else justify_line(ln, width))
+    return "\n".join(lines)
+
+def format_entry(s: str, width: int = JUSTIFY_WIDTH) -> str:
+    return justify_text(s, width)
+
+# Líneas de una comparativa que no se justifican: títulos (🆚), porcentaje (📊), encabezados de sección
+# ("❌ Recursos eliminados (5):") y sus subrayados (------, ======)
+ENCABEZADO_RE = re.compile(r"^(?:🆚|📊)|^[^\w\s]+\s.*:$")
+SUBRAYADO_RE = re.compile(r"^[-=]{5,}$")
+
+def _es_encabezado(linea: str) -> bool:
+    s = linea.strip()
+    return bool(ENCABEZADO_RE.match(s) or SUBRAYADO_RE.match(s))
+
+def _justificar_bloque(bloque: str, width: int) -> str:
+    salida, parrafo = [], []
+    for linea in bloque.split("\n"):
+        if _es_encabezado(linea):
+            if parrafo:
+                salida.append(format_entry(" ".join(" ".join(parrafo).split()), width))
+                parrafo = []
+            salida.append(linea)
+        else:
+            parrafo.append(linea)
+    if parrafo:
+        salida.append(format_entry(" ".join(" ".join(parrafo).split()), width))
+    return "\n".join(salida)
+
+def justificar_bloques(texto: str, width: int = JUSTIFY_WIDTH) -> str:
+    """ Justifica cada recurso (párrafos separados por líneas vacías) de una comparativa. Los encabezados y subrayados
+    se dejan tal cual en su propia línea aunque no haya una línea vacía entre ellos y el primer recurso (formato de las
+    comparativas antiguas). """
+    bloques = texto.replace("\r\n", "\n").split("\n\n")
+    return "\n\n".join(_justificar_bloque(b, width) if b.strip() else b for b in bloques)
@@ -0,0 +1,97 @@
+""" Tabla compilada biblioteca → grados a partir de Grados_UGR_Centros.xlsx.
+
+Leer el Excel exige importar pandas y openpyxl, que es lo más lento del arranque de app.py en Render. Este paso de
+compilación lo convierte en un JSON compacto (Grados_UGR_Centros.json) con las filas ya limpias (sin NaN) y, por
+biblioteca, los índices de sus filas (la columna Biblioteca admite varias separadas por "+"). app.py carga el JSON en
+milisegundos y solo vuelve a leer el Excel (importando pandas en ese momento) si su contenido ha cambiado desde la
+última compilación, lo que se comprueba con el SHA-1 del .xlsx.
+
+Uso: python tabla_grados.py [--excel Grados_UGR_Centros.xlsx] [--salida Grados_UGR_Centros.json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+EXCEL_PATH = "Grados_UGR_Centros.xlsx"
+TABLA_PATH = "Grados_UGR_Centros.json"
+TABLA_VERSION = 1
+
+def sha1_archivo(ruta: str) -> str | None:
+    try:
+        with open(ruta, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+def leer_excel(ruta: str) -> tuple[list[str], list[dict]]:
+    """ (columnas, filas) del Excel; ([], []) si no existe o no se puede leer. """
+    if not os.path.exists(ruta):
+        return [], []
+    import pandas as pd  # solo se importa si hay que recompilar
+    try:
+        # requiere openpyxl en requirements.txt
+        df = pd.read_excel(ruta, engine="openpyxl")
+    except Exception:
+        try:
+            df = pd.read_excel(ruta)
+        except Exception:
+            return [], []
+    df.columns = df.columns.str.strip()
+    df = df.astype(object).where(df.notna(), "")
+    return list(df.columns), df.to_dict("records")
+
+def compilar(excel: str = EXCEL_PATH) -> dict:
+    columnas, filas = leer_excel(excel)
+    por_biblioteca = {}
+    for i, fila in enumerate(filas):
+        for biblioteca in re.split(r"\s*\+\s*", str(fila.get("Biblioteca", "") or "").strip()):
+            if biblioteca:
+                por_biblioteca.setdefault(biblioteca, []).append(i)
+    return {
+        "version": TABLA_VERSION,
+        "excel_sha1": sha1_archivo(excel),
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "columnas": columnas,
+        "filas": filas,
+        "bibliotecas": por_biblioteca,
+    }
+
+def guardar(tabla: dict, ruta: str = TABLA_PATH):
+    tmp = ruta + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(tabla, f, ensure_ascii=False, indent=1, default=str)
+        os.replace(tmp, ruta)
+    except OSError:
+        pass  # disco de solo lectura: la tabla sigue valiendo en memoria
+
+def cargar(excel: str = EXCEL_PATH, ruta: str = TABLA_PATH) -> dict:
+    """ Tabla compilada; se recompila (y se guarda) si falta o si el Excel ha cambiado desde que se generó. """
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            tabla = json.load(f)
+    except (OSError, ValueError):
+        tabla = None
+    if tabla and tabla.get("version") == TABLA_VERSION and (
+            not os.path.exists(excel) or tabla.get("excel_sha1") == sha1_archivo(excel)):
+        return tabla
+    tabla = compilar(excel)
+    guardar(tabla, ruta)
+    return tabla
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compila el Excel de grados en la tabla JSON que carga app.py")
+    parser.add_argument("--excel", default=EXCEL_PATH, help="Excel de grados, centros y bibliotecas")
+    parser.add_argument("--salida", default=TABLA_PATH, help="Tabla JSON compilada")
+    args = parser.parse_args(argv)
+
+    tabla = compilar(args.excel)
+    guardar(tabla, args.salida)
+    print(f"✅ {len(tabla['filas'])} grados en {len(tabla['bibliotecas'])} bibliotecas → {args.salida}")
+
+if __name__ == "__main__":
+    main()
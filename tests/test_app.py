@@ -0,0 +1,88 @@
+""" ETags de la app sobre una copia de un grado real: editar una comparativa tiene que cambiar el ETag de las respuestas
+que dependen de ella (nunca un 304 con datos viejos). """
+
+import json
+import os
+import re
+import shutil
+import time
+
+import pytest
+
+import app
+import comparar
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GRADO = "criminologia_245"
+ARCHIVO = "Guia_docente_Actuaciones_Procesales_de_Investigacion_y_Prueba_24511B6.txt"
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    base = tmp_path / "Comparativas"
+    shutil.copytree(os.path.join(RAIZ, app.BASE_PATH, GRADO), base / GRADO)
+    monkeypatch.setattr(app, "BASE_PATH", str(base))
+    app.sustituir_indice()
+    return app.app.test_client()
+
+def _editar_comparativa(cliente, extra: int):
+    ruta = os.path.join(app.BASE_PATH, GRADO, ARCHIVO)
+    with open(ruta, "r", encoding="utf-8") as f:
+        texto = f.read()
+    texto = re.sub(r"(Recursos eliminados \()(\d+)(\):)", lambda m: f"{m[1]}{int(m[2]) + extra}{m[3]}", texto, count=1)
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(texto)
+
+@pytest.mark.parametrize("url", ["/api/v1/grados?limite=1", f"/api/v1/grados/{GRADO}/asignaturas?limite=1",
+                                 f"/comparativa?carpeta={GRADO}&archivo={ARCHIVO}&formato=json"])
+def test_editar_comparativa_cambia_el_etag(cliente, url):
+    primera = cliente.get(url)
+    etag = primera.headers["ETag"]
+    assert primera.status_code == 200
+    assert cliente.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    _editar_comparativa(cliente, 10000)
+
+    segunda = cliente.get(url, headers={"If-None-Match": etag})
+    assert segunda.status_code == 200
+    assert segunda.headers["ETag"] != etag
+    assert segunda.get_json() != primera.get_json()
+    assert cliente.get(url, headers={"If-None-Match": segunda.headers["ETag"]}).status_code == 304
+
+def test_version_de_la_api_es_su_etag(cliente):
+    resp = cliente.get("/api/v1/grados")
+    assert resp.headers["ETag"] == f'"{resp.get_json()["version"]}"'
+
+def test_trabajo_fallido_no_se_queda_en_curso(monkeypatch):
+    def falla(*args):
+        raise RuntimeError("el hijo ha fallado")
+
+    def indice_roto():
+        raise OSError("carpeta a medio borrar")
+
+    monkeypatch.setattr(app, "_ejecutar_en_proceso", falla)
+    monkeypatch.setattr(app, "sustituir_indice", indice_roto)
+    monkeypatch.setattr(app, "actualizar_busqueda_en_segundo_plano", lambda: None)
+    app.lanzar_trabajo("comparar")
+    limite = time.time() + 5
+    while app._indice_congelado.is_set() and time.time() < limite:
+        time.sleep(0.01)
+    assert not app._indice_congelado.is_set()
+    assert app._estado_trabajo("comparar")["estado"] == "error"
+
+def test_indice_grado_viejo_no_se_usa(cliente):
+    """ Una ejecución cortada tras reescribir el .txt pero antes de regenerar indice_grado.json: la app tiene que contar
+    desde el .txt. """
+    comparar.escribir_comparativa(app.BASE_PATH, "criminologia", "245", "Nueva", "2451199", ["a"], ["b"], [], 0.5)
+    carpeta = os.path.join(app.BASE_PATH, GRADO)
+    comparar.escribir_indice_grado(carpeta)
+    archivo = "Nueva_2451199.txt"
+    assert cliente.get(f"/api/v1/grados/{GRADO}/asignaturas?prefijo=2451199").get_json()["items"][0]["cambios"] == 1
+
+    comparar.escribir_comparativa(app.BASE_PATH, "criminologia", "245", "Nueva", "2451199", ["a", "c"], ["b"], ["d"],
+                                  0.7)
+    with open(os.path.join(carpeta, "Nueva_2451199.json"), "r", encoding="utf-8") as f:
+        assert comparar.registro_al_dia(json.load(f), os.stat(os.path.join(carpeta, archivo)))
+    # El índice sigue siendo el de la primera versión
+    item = cliente.get(f"/api/v1/grados/{GRADO}/asignaturas?prefijo=2451199").get_json()["items"][0]
+    assert (item["n_eliminados"], item["n_anadidos"], item["cambios"]) == (2, 1, 3)
+    assert comparar.leer_comparativa(os.path.join(carpeta, archivo))["eliminados"] == ["a", "c"]
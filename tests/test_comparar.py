@@ -0,0 +1,16 @@
+""" Funciones de comparar.py que escriben en Comparativas. """
+
+import datetime
+
+import comparar
+
+def test_resumenes_del_mismo_instante_no_se_pisan(tmp_path, monkeypatch):
+    class Reloj(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2026, 1, 1, 12, 0, 0)
+
+    monkeypatch.setattr(comparar, "datetime", Reloj)
+    marcas = [comparar.reservar_resumen(str(tmp_path))[1] for _ in range(3)]
+    assert len(set(marcas)) == 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(f"Resumen_{m}.txt" for m in marcas)
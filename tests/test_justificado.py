@@ -0,0 +1,28 @@
+""" justificar_bloques sobre una comparativa real del repositorio (formato antiguo: sin línea vacía entre el
+encabezado de sección, su subrayado y el primer recurso). """
+
+import os
+
+from justificado import justificar_bloques
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPARATIVA = os.path.join(RAIZ, "BibliografiasUGR", "grados", "Comparativas", "ingenieria-informatica-ceuta_496",
+                           "Guia_docente_Estructura_de_Datos_4961122.txt")
+
+def _leer():
+    with open(COMPARATIVA, "r", encoding="utf-8") as f:
+        return f.read()
+
+def test_encabezados_y_subrayados_quedan_en_su_linea():
+    original = _leer().splitlines()
+    justificado = justificar_bloques(_leer(), 100).splitlines()
+    encabezados = [l for l in original if l.startswith(("🆚", "❌", "📚", "✅", "📊")) or set(l) in ({"-"}, {"="})]
+    assert encabezados
+    for linea in encabezados:
+        assert linea in justificado
+
+def test_primer_recurso_no_se_une_al_encabezado():
+    justificado = justificar_bloques(_leer(), 100).splitlines()
+    i = justificado.index(next(l for l in justificado if l.startswith("❌ Recursos eliminados")))
+    assert set(justificado[i + 1]) == {"-"}
+    assert justificado[i + 2].startswith("Brooks/Cole. 2001")